@@ -19,7 +19,7 @@
 To install the dependencies for this script, run:
 
 ``` 
-pip install google-genai opencv-python pyaudio pillow mss
+pip install google-genai opencv-python numpy pyaudio mss
 ```
 
 Before running this script, ensure the `GOOGLE_API_KEY` environment
@@ -46,16 +46,12 @@ python Get_started_LiveAPI.py --mode screen
 """
 
 import asyncio
-import base64
-import io
 import os
 import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
-import cv2
 import pyaudio
-import PIL.Image
-import mss
 
 import argparse
 
@@ -84,12 +80,99 @@ CONFIG = {"response_modalities": ["AUDIO"]}
 pya = pyaudio.PyAudio()
 
 
+class FramePipeline:
+    """Turns raw camera/screen pixels into JPEG messages for the Live API.
+
+    Frames are encoded straight from the capture buffer with OpenCV, skipped
+    when a 32x18 grayscale thumbnail shows no change since the last frame
+    sent, and the frame rate and JPEG quality back off while the send path
+    is congested. Capture and encoding run on one dedicated worker thread so
+    they never compete with the audio threads.
+    """
+
+    def __init__(
+        self,
+        max_fps=1.0,
+        min_fps=0.2,
+        max_quality=80,
+        min_quality=40,
+        change_threshold=2.0,
+        max_size=1024,
+    ):
+        self.min_interval = 1.0 / max_fps
+        self.max_interval = 1.0 / min_fps
+        self.max_quality = max_quality
+        self.min_quality = min_quality
+        self.change_threshold = change_threshold
+        self.max_size = max_size
+
+        self.interval = self.min_interval
+        self.quality = max_quality
+        self.sent = 0
+        self.skipped = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="video")
+        self._last_thumb = None
+
+    def changed(self, image, bgra=False):
+        import cv2
+        import numpy as np
+
+        gray = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY if bgra else cv2.COLOR_BGR2GRAY)
+        thumb = cv2.resize(gray, (32, 18), interpolation=cv2.INTER_AREA).astype(np.int16)
+        if self._last_thumb is not None:
+            if np.abs(thumb - self._last_thumb).mean() < self.change_threshold:
+                return False
+        self._last_thumb = thumb
+        return True
+
+    def encode(self, image, bgra=False):
+        """Return a JPEG message for image, or None if it hasn't changed"""
+        import cv2
+
+        if not self.changed(image, bgra):
+            self.skipped += 1
+            return None
+
+        height, width = image.shape[:2]
+        scale = min(1.0, self.max_size / max(height, width))
+        if scale < 1.0:
+            image = cv2.resize(
+                image,
+                (int(width * scale), int(height * scale)),
+                interpolation=cv2.INTER_AREA,
+            )
+        if bgra:
+            image = cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+
+        ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            return None
+        self.sent += 1
+        return {"mime_type": "image/jpeg", "data": jpeg.tobytes()}
+
+    def adapt(self, congested):
+        """Slow down and lower quality under backpressure, recover once it clears"""
+        if congested:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+            self.quality = max(self.min_quality, self.quality - 10)
+        else:
+            self.interval = max(self.min_interval, self.interval / 1.25)
+            self.quality = min(self.max_quality, self.quality + 5)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
 class AudioLoop:
     def __init__(self, video_mode=DEFAULT_MODE):
         self.video_mode = video_mode
 
         self.audio_in_queue = None
         self.out_queue = None
+        self.video_queue = None
+        # OpenCV, numpy and mss are only imported once a video mode needs them
+        self.video = FramePipeline() if video_mode != "none" else None
+        self._sct = None
 
         self.session = None
 
@@ -108,78 +191,76 @@ class AudioLoop:
             await self.session.send(input=text or ".", end_of_turn=True)
 
     def _get_frame(self, cap):
-        # Read the frameq
+        # Read the frame
         ret, frame = cap.read()
         # Check if the frame was read successfully
         if not ret:
-            return None
-        # Fix: Convert BGR to RGB color space
-        # OpenCV captures in BGR but PIL expects RGB format
-        # This prevents the blue tint in the video feed
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = PIL.Image.fromarray(frame_rgb)  # Now using RGB frame
-        img.thumbnail([1024, 1024])
+            return False, None
+        # OpenCV captures BGR, which is what the JPEG encoder expects
+        return True, self.video.encode(frame)
+
+    def _get_screen(self):
+        import mss
+        import numpy as np
+
+        # mss handles aren't thread-safe, so keep one on the video worker thread
+        if self._sct is None:
+            self._sct = mss.mss()
+        shot = self._sct.grab(self._sct.monitors[0])
+        # Encode from the raw BGRA buffer rather than round-tripping through PNG
+        return True, self.video.encode(np.asarray(shot), bgra=True)
+
+    async def _stream_video(self, capture, *args):
+        loop = asyncio.get_running_loop()
+        while True:
+            ok, frame = await loop.run_in_executor(self.video.executor, capture, *args)
+            if not ok:
+                break
+            # Backpressure means the previous frame hadn't been sent by the time this one was ready
+            congested = (
+                self.video_queue.full()
+                or self.out_queue.qsize() >= self.out_queue.maxsize // 2
+            )
+            if frame is not None:
+                self.queue_video(frame)
 
-        image_io = io.BytesIO()
-        img.save(image_io, format="jpeg")
-        image_io.seek(0)
+            self.video.adapt(congested=congested)
+            await asyncio.sleep(self.video.interval)
 
-        mime_type = "image/jpeg"
-        image_bytes = image_io.read()
-        return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode()}
+    def queue_video(self, frame):
+        # Only the newest frame is worth sending; replace one that is still waiting
+        if self.video_queue.full():
+            self.video_queue.get_nowait()
+        self.video_queue.put_nowait(frame)
 
     async def get_frames(self):
+        import cv2
+
         # This takes about a second, and will block the whole program
         # causing the audio pipeline to overflow if you don't to_thread it.
         cap = await asyncio.to_thread(
             cv2.VideoCapture, 0
         )  # 0 represents the default camera
 
-        while True:
-            frame = await asyncio.to_thread(self._get_frame, cap)
-            if frame is None:
-                break
-
-            await asyncio.sleep(1.0)
-
-            await self.out_queue.put(frame)
+        await self._stream_video(self._get_frame, cap)
 
         # Release the VideoCapture object
         cap.release()
 
-    def _get_screen(self):
-        sct = mss.mss()
-        monitor = sct.monitors[0]
-
-        i = sct.grab(monitor)
-
-        mime_type = "image/jpeg"
-        image_bytes = mss.tools.to_png(i.rgb, i.size)
-        img = PIL.Image.open(io.BytesIO(image_bytes))
-
-        image_io = io.BytesIO()
-        img.save(image_io, format="jpeg")
-        image_io.seek(0)
-
-        image_bytes = image_io.read()
-        return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode()}
-
     async def get_screen(self):
-
-        while True:
-            frame = await asyncio.to_thread(self._get_screen)
-            if frame is None:
-                break
-
-            await asyncio.sleep(1.0)
-
-            await self.out_queue.put(frame)
+        await self._stream_video(self._get_screen)
 
     async def send_realtime(self):
         while True:
             msg = await self.out_queue.get()
             await self.session.send(input=msg)
 
+    async def send_video(self):
+        # Images go out on their own queue so audio never waits behind them
+        while True:
+            frame = await self.video_queue.get()
+            await self.session.send(input=frame)
+
     async def listen_audio(self):
         mic_info = pya.get_default_input_device_info()
         self.audio_stream = await asyncio.to_thread(
@@ -239,14 +320,17 @@ class AudioLoop:
 
                 self.audio_in_queue = asyncio.Queue()
                 self.out_queue = asyncio.Queue(maxsize=5)
+                self.video_queue = asyncio.Queue(maxsize=1)
 
                 send_text_task = tg.create_task(self.send_text())
                 tg.create_task(self.send_realtime())
                 tg.create_task(self.listen_audio())
                 if self.video_mode == "camera":
                     tg.create_task(self.get_frames())
+                    tg.create_task(self.send_video())
                 elif self.video_mode == "screen":
                     tg.create_task(self.get_screen())
+                    tg.create_task(self.send_video())
 
                 tg.create_task(self.receive_audio())
                 tg.create_task(self.play_audio())
@@ -259,6 +343,9 @@ class AudioLoop:
         except ExceptionGroup as EG:
             self.audio_stream.close()
             traceback.print_exception(EG)
+        finally:
+            if self.video:
+                self.video.close()
 
 
 if __name__ == "__main__":
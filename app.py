@@ -1,18 +1,37 @@
-from flask import Flask, render_template
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, jsonify, render_template, request
 from flask_socketio import SocketIO, emit
 import asyncio
+import atexit
+import logging
 import threading
+from collections import deque
 import base64
-import pyaudio
 from datetime import datetime
 import os
-from google import genai
+import secrets
 import sys
 from dotenv import load_dotenv
+from config import AUDIO_CONFIG, DB_CONFIG, METRICS_CONFIG, SERVER_CONFIG, SESSION_CONFIG, SYSTEM_PROMPT, TRANSCRIPT_CONFIG
+from sql_utils import AsyncSupabaseFoodOrderingTools, SupabaseDeliveryFeed, SupabaseFoodOrderingTools, normalize_phone
+from audio_codecs import InboundAudio, OutboundAudio, negotiate
+from audio_utils import AudioFrame, AudioQueue, FramePool, PlaybackEngine, coalesce, create_vad_gate
+from log_utils import LogSampler, SessionLogger, configure_logging, dropped_records
+from message_queue import socketio_queue_options
+from metrics import SessionMetrics, render_prometheus, startup_timings
+from order_journal import OrderJournal
+from prefetch import PrefetchCache
+from supervisor import SessionLost, TaskSupervisor
+from tool_dispatcher import FUNCTION_DECLARATIONS, ToolDispatcher
+from transcripts import TranscriptStore, TranscriptWriter
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger('voicebot')
+
 if sys.version_info < (3, 11, 0):
     import taskgroup, exceptiongroup
     asyncio.TaskGroup = taskgroup.TaskGroup
@@ -20,76 +39,472 @@ if sys.version_info < (3, 11, 0):
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key'
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    # Sessions live on our own asyncio thread, so the server must use real OS threads
+    async_mode="threading",
+    # Lets any worker emit to a caller connected to another one (see run.py)
+    **socketio_queue_options(os.getenv("SOCKETIO_MESSAGE_QUEUE", SERVER_CONFIG["message_queue"])),
+)
 
 # Audio configuration
-FORMAT = pyaudio.paInt16
 CHANNELS = 1
 SEND_SAMPLE_RATE = 16000
 RECEIVE_SAMPLE_RATE = 24000
 CHUNK_SIZE = 1024
 
 MODEL = "models/gemini-2.0-flash-live-001"
-CONFIG = {"response_modalities": ["AUDIO"]}
+# Queued after the last voiced chunk so the server closes the user's turn
+AUDIO_STREAM_END = {"audio_stream_end": True}
+
+CONFIG = {
+    "response_modalities": ["AUDIO"],
+    "system_instruction": SYSTEM_PROMPT,
+    "tools": [{"function_declarations": FUNCTION_DECLARATIONS}],
+    # Ask the server for resumption handles so a dropped socket can pick up where it left off
+    "session_resumption": {},
+    # Text of both sides of the conversation, for the UI and the transcript store
+    "input_audio_transcription": {},
+    "output_audio_transcription": {},
+    # Keep long calls inside the context window with a sliding window over old turns
+    "context_window_compression": {
+        "trigger_tokens": SESSION_CONFIG["context_trigger_tokens"],
+        "sliding_window": {"target_tokens": SESSION_CONFIG["context_target_tokens"]},
+    },
+}
+
+def format_menu(items):
+    lines = [
+        f"- {item['item_id']}: {item['name']} ({item.get('category')}) ${float(item['price']):.2f}"
+        for item in items
+    ]
+    return "**Current Menu (item_id: name (category) price):**\n" + "\n".join(lines)
+
+class LiveConfig:
+    """Session setup shared by every caller.
+    
+    The system instruction is the static prompt plus a snapshot of the menu.
+    It is built once and rebuilt only when the menu changes, so every session
+    opens with the same prefix and the model knows the menu without a
+    get_menu_items round trip.
+    """
+    
+    def __init__(self, base):
+        self.base = base
+        self._config = base
+        self._menu = None
+        self._lock = threading.Lock()
+    
+    def get(self):
+        """The current config; blocking, so call it off the event loop"""
+        if not SESSION_CONFIG["menu_in_prompt"]:
+            return self.base
+        try:
+            menu = get_db_tools().tools.menu_cache.get_items()
+        except Exception as e:
+            logger.warning('Menu unavailable for the system prompt', extra={'error': repr(e)})
+            return self._config
+        with self._lock:
+            if menu != self._menu:
+                self._menu = menu
+                self._config = {
+                    **self.base,
+                    "system_instruction": f"{SYSTEM_PROMPT}\n\n{format_menu(menu)}",
+                }
+            return self._config
+
+live_config = LiveConfig(CONFIG)
+
+# Heavy clients, created on first use so a worker boots without them
+_client = None
+_pya = None
+_clients_lock = threading.Lock()
+
+def get_client():
+    """The Google AI client, built before the first Live API connection"""
+    global _client
+    with _clients_lock:
+        if _client is None:
+            with startup_timings.measure('genai_client'):
+                from google import genai
+                
+                http_options = {"api_version": "v1beta"}
+                if base_url := os.getenv("LIVE_API_BASE_URL"):
+                    # Point the client at a local stand-in such as benchmarks/fake_live_server.py
+                    http_options["base_url"] = base_url
+                _client = genai.Client(http_options=http_options)
+        return _client
+
+_connection_errors = None
+
+def connection_errors():
+    """Exceptions meaning the Live API connection dropped, which resuming the session can fix"""
+    global _connection_errors
+    if _connection_errors is None:
+        from google.genai.errors import APIError
+        from websockets.exceptions import WebSocketException
+        
+        _connection_errors = (ConnectionError, OSError, asyncio.TimeoutError, WebSocketException, APIError)
+    return _connection_errors
+
+def get_pya():
+    """PyAudio, initialized only when server-side audio is used"""
+    global _pya
+    with _clients_lock:
+        if _pya is None:
+            with startup_timings.measure('pyaudio'):
+                import pyaudio
+                
+                _pya = pyaudio.PyAudio()
+        return _pya
+
+# Supabase tools shared by every session, created on first use
+_db_tools = None
+_db_tools_lock = threading.Lock()
 
-# Initialize Google AI client
-client = genai.Client(http_options={"api_version": "v1beta"})
-pya = pyaudio.PyAudio()
+def report_order_failure(payload, error):
+    """Tell the caller that an order they were told was placed could not be saved"""
+    if payload.get('session_id'):
+        socketio.emit('order_failed', {
+            'order_id': payload['order']['order_id'],
+            'message': 'Sorry, your order could not be saved. Please place it again.',
+        }, to=payload['session_id'])
+
+def get_db_tools():
+    global _db_tools
+    with _db_tools_lock:
+        if _db_tools is None:
+            with startup_timings.measure('supabase_tools'):
+                _db_tools = AsyncSupabaseFoodOrderingTools(SupabaseFoodOrderingTools(
+                    warm_menu_cache=True, journal=OrderJournal(DB_CONFIG["journal_path"])
+                ))
+            _db_tools.tools.on_journal_failure = report_order_failure
+            # Commits journaled orders, starting with any a previous run left behind
+            background_loop.submit(_db_tools.run_journal_flusher())
+            # Keep order status lookups local and push delivery changes to callers
+            background_loop.submit(
+                SupabaseDeliveryFeed(_db_tools.tools.order_index, menu_cache=_db_tools.tools.menu_cache).start()
+            )
+        return _db_tools
+
+transcript_store = TranscriptStore(TRANSCRIPT_CONFIG["path"])
+transcript_writer = TranscriptWriter(
+    transcript_store, TRANSCRIPT_CONFIG["flush_turns"], TRANSCRIPT_CONFIG["flush_interval_ms"]
+)
+
+def session_open(session):
+    """Whether a Live API session's websocket is still open, as far as the client knows"""
+    # The SDK doesn't expose this, so look at the websocket it wraps
+    state = getattr(getattr(session, '_ws', None), 'state', None)
+    return state is None or getattr(state, 'name', 'OPEN') == 'OPEN'
+
+class LiveSessionPool:
+    """Pre-connected Live API sessions handed to callers on start_voice.
+    
+    A background task keeps the pool full, replacing sessions that are
+    refresh_after seconds old or that the server has closed, so callers
+    don't inherit one that is about to expire or already dead.
+    """
+    
+    def __init__(self, size, max_idle, refresh_after=SESSION_CONFIG["warm_session_refresh_after"],
+                 check_interval=SESSION_CONFIG["warm_session_check_interval"]):
+        self.size = size
+        self.max_idle = max_idle
+        self.refresh_after = min(refresh_after, max_idle)
+        self.check_interval = check_interval
+        self._idle = deque()
+        self._refill_task = None
+        self._wakeup = None
+    
+    async def connect(self, config=None):
+        """Open a new Live API session and return its (context, session)"""
+        if config is None:
+            config = await asyncio.to_thread(live_config.get)
+        client = await asyncio.to_thread(get_client)
+        session_context = client.aio.live.connect(model=MODEL, config=config)
+        session = await session_context.__aenter__()
+        return session_context, session
+    
+    async def acquire(self):
+        """Take a warm session, or connect a fresh one if none is ready"""
+        while self._idle:
+            session_context, session, connected_at = self._idle.popleft()
+            if time.monotonic() - connected_at < self.max_idle and session_open(session):
+                self.replenish()
+                return session_context, session
+            asyncio.create_task(self._close(session_context))
+        self.replenish()
+        return await self.connect()
+    
+    def replenish(self):
+        """Top the pool back up in the background; must run on the event loop"""
+        if not self.size:
+            return
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        self._wakeup.set()
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+    
+    def _needs_refresh(self, entry, now):
+        _, session, connected_at = entry
+        return now - connected_at >= self.refresh_after or not session_open(session)
+    
+    async def _refill(self):
+        """Keep the pool full and fresh until cancelled"""
+        failures = 0
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            for entry in [entry for entry in self._idle if self._needs_refresh(entry, now)]:
+                self._idle.remove(entry)
+                await self._close(entry[0])
+            
+            if len(self._idle) < self.size:
+                try:
+                    self._idle.append((*await self.connect(), time.monotonic()))
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    logger.warning('Warm session connect error', extra={'error': repr(e), 'failures': failures})
+                    await asyncio.sleep(min(30, 2 ** failures))
+                continue
+            
+            # Full: wait for the oldest to come due, a dropped socket, or an acquire
+            oldest = min(connected_at for _, _, connected_at in self._idle)
+            timeout = min(self.check_interval, max(0.0, oldest + self.refresh_after - now))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+    
+    @staticmethod
+    async def _close(session_context):
+        try:
+            await session_context.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning('Warm session close error', extra={'error': repr(e)})
+    
+    async def close(self):
+        if self._refill_task:
+            self._refill_task.cancel()
+        while self._idle:
+            session_context, _, _ = self._idle.popleft()
+            await self._close(session_context)
+
+session_pool = LiveSessionPool(SESSION_CONFIG["warm_pool_size"], SESSION_CONFIG["warm_session_max_idle"])
 
 class VoiceBot:
-    def __init__(self):
+    def __init__(self, sid, io_mode=AUDIO_CONFIG["io_mode"]):
+        self.sid = sid
+        self.io_mode = io_mode
         self.session = None
+        self.session_context = None
+        self.resumption_handle = None
+        self.reconnect_lock = asyncio.Lock()
         self.audio_in_queue = None
         self.out_queue = None
         self.audio_stream = None
+        self.playback = None
+        self.vad = create_vad_gate(AUDIO_CONFIG, SEND_SAMPLE_RATE)
+        self.frame_pool = FramePool(CHUNK_SIZE * 2)
+        self.send_batch_bytes = int(SEND_SAMPLE_RATE * AUDIO_CONFIG["send_batch_ms"] / 1000) * 2
+        self.metrics = SessionMetrics(sid)
+        self.log = SessionLogger(logger, {'session': sid})
+        self.supervisor = TaskSupervisor(self.log, on_give_up=self.end_session, on_failure=self.report_task_failure)
+        # Per-chunk events log a sample, not every occurrence
+        self.overflow_sampler = LogSampler()
+        self.send_sampler = LogSampler()
+        self.playback_sampler = LogSampler()
+        self.stop_task = None
+        # The start_session in progress, so a second start_voice or a disconnect can see it
+        self.start_task = None
+        self.closed = False
+        self.mic_overflows = 0
+        # Reported by the browser, which does its own playback
+        self.browser_underruns = 0
         self.is_listening = False
+        self.listen_task = None
         self.tasks = []
+        self.tool_dispatcher = None
+        self.tool_tasks = set()
+        self.resume_tasks = set()
+        self.delivery_watches = {}
+        self.audio_format = None
+        self.inbound = None
+        self.outbound = None
+        self.input_transcript = []
+        self.output_transcript = []
+        # Transcripts are stored under this rather than the sid, which /metrics publishes
+        self.transcript_id = secrets.token_urlsafe(16)
+        # Completed turns so far; scopes idempotency keys for order writes
+        self.turn = 0
+        self.prefetch = PrefetchCache(self.metrics)
+        self.prefetch_watch = None
         
-    async def start_session(self):
-        """Start the Live API session"""
+    def emit(self, event, data):
+        """Emit an event to this caller only"""
+        # This worker holds the caller's socket, so skip the message queue round trip
+        socketio.emit(event, data, to=self.sid, ignore_queue=True)
+    
+    def commit_transcript(self, role):
+        """Record the buffered transcription of one side's turn"""
+        fragments = self.input_transcript if role == 'user' else self.output_transcript
+        text = ''.join(fragments).strip()
+        fragments.clear()
+        if not text:
+            return
+        transcript_writer.record(self.transcript_id, role, text)
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.emit('user_input' if role == 'user' else 'bot_response', {'text': text, 'timestamp': timestamp})
+    
+    async def start_session(self, phone_number=None):
+        """Start the Live API session, prefetching what the caller is likely to ask for first"""
         try:
-            self.session = await client.aio.live.connect(model=MODEL, config=CONFIG).__aenter__()
-            self.audio_in_queue = asyncio.Queue()
-            self.out_queue = asyncio.Queue(maxsize=5)
+            db_tools = await asyncio.to_thread(get_db_tools)
+            # Runs while the Live API session connects
+            self.start_prefetch(db_tools, phone_number)
+            self.session_context, self.session = await session_pool.acquire()
+            self.tool_dispatcher = ToolDispatcher(
+                db_tools, self.emit, self.metrics, watch_phone=self.watch_phone,
+                idempotency_scope=lambda: f"{self.sid}:{self.turn}", prefetch=self.prefetch, session_id=self.sid
+            )
+            self.audio_in_queue = AudioQueue(
+                AUDIO_CONFIG["receive_queue_max_ms"], RECEIVE_SAMPLE_RATE, AUDIO_CONFIG["receive_queue_policy"]
+            )
+            self.out_queue = AudioQueue(
+                AUDIO_CONFIG["send_queue_max_ms"], SEND_SAMPLE_RATE, AUDIO_CONFIG["send_queue_policy"]
+            )
             
-            # Start background tasks
+            # Start background tasks; a failed one is restarted or ends the session
             self.tasks = [
-                asyncio.create_task(self.send_realtime()),
-                asyncio.create_task(self.receive_audio()),
-                asyncio.create_task(self.play_audio())
+                self.supervisor.start('send_realtime', self.send_realtime),
+                self.supervisor.start('receive_audio', self.receive_audio),
+                self.supervisor.start('play_audio', self.play_audio),
+                self.supervisor.start('push_metrics', self.push_metrics),
             ]
             
-            socketio.emit('status', {'message': 'Connected to Gemini Live API'})
+            self.log.info('Session started', extra={'phone_prefetch': bool(phone_number)})
+            self.emit('status', {'message': 'Connected to Gemini Live API'})
+            self.emit('transcript', {'url': f'/transcripts/{self.transcript_id}'})
             return True
         except Exception as e:
-            socketio.emit('status', {'message': f'Failed to connect: {str(e)}'})
+            self.log.error('Session start failed', exc_info=e)
+            self.emit('status', {'message': f'Failed to connect: {str(e)}'})
             return False
     
+    async def start_voice(self, phone_number=None):
+        """Start the session if it isn't running, then listen.
+
+        A start_voice while a start is still connecting is ignored; the
+        first one starts listening once connected.
+        """
+        if self.closed or (self.start_task and not self.start_task.done()):
+            return
+        if not self.session:
+            self.start_task = asyncio.create_task(self.start_session(phone_number))
+            try:
+                if not await self.start_task:
+                    return
+            except asyncio.CancelledError:
+                # stop_session cancelled the start
+                return
+        await self.start_listening()
+    
+    def start_prefetch(self, db_tools, phone_number=None):
+        """Refresh the shared menu cache if it is stale, and fetch the caller's orders if their number is known.
+
+        The menu is served from the shared cache, which the change feed
+        invalidates, so only the reload is done here, not a copy kept per
+        session. Otherwise the first menu tool call after the cache expired
+        would reload the whole menu mid-turn.
+        """
+        if db_tools.tools.menu_cache.is_stale():
+            self.prefetch.start('menu', db_tools.refresh_menu())
+        if not phone_number:
+            return
+        key = ('order_status', normalize_phone(phone_number))
+        self.prefetch.start(key, db_tools.get_order_status(str(phone_number)))
+        # A delivery change makes the prefetched status stale
+        self.prefetch_watch = db_tools.tools.order_index.subscribe(
+            phone_number, lambda delivery: self.prefetch.invalidate(key)
+        )
+    
+    def report_task_failure(self, name, error, restarting):
+        """Tell the caller and the metrics that a pipeline task failed"""
+        self.metrics.set_gauge('task_failures', self.metrics.gauges.get('task_failures', 0) + 1)
+        if restarting:
+            self.emit('status', {'message': f'Recovering from an error in {name}'})
+    
+    def end_session(self, name, error):
+        """Shut the session down cleanly after a pipeline task gave up"""
+        if self.stop_task and not self.stop_task.done():
+            # Losing the session fails the send and receive loops together
+            return
+        self.log.error('Ending session after pipeline failure', extra={'task': name, 'error': repr(error)})
+        self.emit('status', {'message': 'Call ended after an error'})
+        # A separate task, since stop_session cancels the task that called us
+        self.stop_task = asyncio.create_task(self.stop_session())
+    
+    async def close(self):
+        """Stop the session for good once the caller has disconnected"""
+        self.closed = True
+        await self.stop_session()
+    
     async def stop_session(self):
         """Stop the Live API session"""
-        if self.audio_stream:
-            self.audio_stream.stop_stream()
-            self.audio_stream.close()
-            
-        for task in self.tasks:
+        if self.start_task and not self.start_task.done():
+            # Otherwise it would store a session and start tasks after we've cleaned up
+            self.start_task.cancel()
+            await asyncio.gather(self.start_task, return_exceptions=True)
+        self.start_task = None
+        await self.stop_listening()
+        
+        self.prefetch.close()
+        if self.prefetch_watch:
+            self.prefetch_watch()
+            self.prefetch_watch = None
+        
+        pending = [*self.tasks, *self.tool_tasks, *self.resume_tasks]
+        for task in pending:
             task.cancel()
-            
-        if self.session:
-            await self.session.__aexit__(None, None, None)
-            
-        self.is_listening = False
-        socketio.emit('status', {'message': 'Disconnected'})
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.tasks = []
+        self.tool_tasks.clear()
+        self.resume_tasks.clear()
+        
+        for unsubscribe in self.delivery_watches.values():
+            unsubscribe()
+        self.delivery_watches.clear()
+        
+        if self.session_context:
+            await self.session_context.__aexit__(None, None, None)
+        self.session_context = None
+        self.resumption_handle = None
+        self.session = None
+        
+        self.emit('status', {'message': 'Disconnected'})
     
     async def start_listening(self):
         """Start listening to microphone"""
         if self.is_listening:
             return
+        
+        if self.io_mode == "browser":
+            # Audio arrives through feed_audio as the browser streams it
+            self.is_listening = True
+            self.emit('status', {'message': 'Listening...'})
+            return
             
         try:
+            import pyaudio
+            
+            pya = await asyncio.to_thread(get_pya)
             mic_info = pya.get_default_input_device_info()
             self.audio_stream = await asyncio.to_thread(
                 pya.open,
-                format=FORMAT,
+                format=pyaudio.paInt16,
                 channels=CHANNELS,
                 rate=SEND_SAMPLE_RATE,
                 input=True,
@@ -98,146 +513,545 @@ class VoiceBot:
             )
             
             self.is_listening = True
-            self.tasks.append(asyncio.create_task(self.listen_audio()))
-            socketio.emit('status', {'message': 'Listening...'})
+            self.listen_task = self.supervisor.start('listen_audio', self.listen_audio)
+            self.emit('status', {'message': 'Listening...'})
             
         except Exception as e:
-            socketio.emit('status', {'message': f'Microphone error: {str(e)}'})
+            self.emit('status', {'message': f'Microphone error: {str(e)}'})
     
     async def stop_listening(self):
         """Stop listening to microphone"""
         self.is_listening = False
+        if self.listen_task:
+            # Let the pending read finish before the stream is closed under it
+            try:
+                await asyncio.wait_for(self.listen_task, timeout=1.0)
+            except (asyncio.TimeoutError, Exception):
+                pass
+            self.listen_task = None
         if self.audio_stream:
             self.audio_stream.stop_stream()
             self.audio_stream.close()
-        socketio.emit('status', {'message': 'Stopped listening'})
+            self.audio_stream = None
+        self.emit('status', {'message': 'Stopped listening'})
+    
+    def gate_audio(self, frame):
+        """Run a mic frame through the VAD and return the items to queue"""
+        if self.vad is None:
+            return [frame]
+        frames, speech_ended = self.vad.process(frame)
+        if speech_ended:
+            frames.append(AUDIO_STREAM_END)
+            self.metrics.mark_speech_end()
+        return frames
+    
+    def configure_audio(self, offer):
+        """Negotiate this caller's codecs and rates and tell the client the result"""
+        self.audio_format = negotiate(
+            offer, SEND_SAMPLE_RATE, RECEIVE_SAMPLE_RATE, AUDIO_CONFIG["codec_preference"]
+        )
+        client_in, client_out = self.audio_format["input"], self.audio_format["output"]
+        self.inbound = InboundAudio(client_in["codec"], client_in["sample_rate"], SEND_SAMPLE_RATE)
+        self.outbound = OutboundAudio(client_out["codec"], client_out["sample_rate"], RECEIVE_SAMPLE_RATE)
+        self.emit('audio_format', self.audio_format)
+    
+    def feed_audio(self, data):
+        """Queue a chunk streamed from the browser, decoded to 16 kHz PCM16"""
+        if not self.is_listening or self.out_queue is None:
+            return
+        if self.inbound:
+            data = self.inbound.process(data)
+            if not data:
+                return
+        for item in self.gate_audio(AudioFrame(data)):
+            if item is not AUDIO_STREAM_END:
+                item.enqueued_at = time.perf_counter()
+            self.out_queue.put_nowait(item)
+    
+    async def read_mic_frame(self):
+        """Read one chunk from the mic, straight into a pooled buffer when the stream allows"""
+        if hasattr(self.audio_stream, 'readinto'):
+            return await asyncio.to_thread(self.frame_pool.read_frame, self.audio_stream)
+        return AudioFrame(await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE))
     
     async def listen_audio(self):
         """Listen to audio from microphone and send to API"""
-        kwargs = {"exception_on_overflow": False} if __debug__ else {}
-        
         while self.is_listening:
             try:
-                data = await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE, **kwargs)
-                await self.out_queue.put({"data": data, "mime_type": "audio/pcm"})
-            except Exception as e:
-                print(f"Audio listening error: {e}")
-                break
+                frame = await self.read_mic_frame()
+                if frame is None:
+                    break
+                for item in self.gate_audio(frame):
+                    if item is not AUDIO_STREAM_END:
+                        item.enqueued_at = time.perf_counter()
+                    await self.out_queue.put(item)
+            except OSError as e:
+                import pyaudio
+                
+                if e.errno != pyaudio.paInputOverflowed:
+                    raise
+                # PortAudio overwrote unread input; count it and keep reading
+                self.mic_overflows += 1
+                if (skipped := self.overflow_sampler.sample()) is not None:
+                    self.log.warning('Mic input overflowed', extra={
+                        'mic_overflows': self.mic_overflows, 'unlogged': skipped,
+                    })
+    
+    async def next_send_batch(self):
+        """Collect queued frames up to send_batch_ms of audio.
+        
+        Returns (frames, end_of_speech). Backlog is drained without waiting;
+        otherwise it waits for more frames only until the oldest one has been
+        queued for send_batch_ms.
+        """
+        item = await self.out_queue.get()
+        frames = []
+        size = 0
+        while item is not AUDIO_STREAM_END:
+            frames.append(item)
+            size += len(item)
+            if size >= self.send_batch_bytes:
+                return frames, False
+            try:
+                item = self.out_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = frames[0].enqueued_at + AUDIO_CONFIG["send_batch_ms"] / 1000 - time.perf_counter()
+                if remaining <= 0:
+                    return frames, False
+                try:
+                    item = await asyncio.wait_for(self.out_queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return frames, False
+        return frames, True
     
     async def send_realtime(self):
         """Send audio data to the Live API"""
         while True:
+            session = self.session
             try:
-                msg = await self.out_queue.get()
-                if self.session:
-                    await self.session.send(input=msg)
-            except Exception as e:
-                print(f"Send error: {e}")
-                break
+                frames, end_of_speech = await self.next_send_batch()
+                session = self.session
+                if frames:
+                    sent_at = time.perf_counter()
+                    for frame in frames:
+                        self.metrics.observe('queue_wait_ms', (sent_at - frame.enqueued_at) * 1000)
+                    data = coalesce(frames)
+                    if session:
+                        await session.send(input={"data": data, "mime_type": "audio/pcm"})
+                    if (skipped := self.send_sampler.sample()) is not None:
+                        self.log.debug('Sent audio batch', extra={
+                            'frames': len(frames), 'bytes': len(data), 'unlogged': skipped,
+                            'queue_ms': self.out_queue.stats()['ms'],
+                        })
+                if end_of_speech and session:
+                    await session.send_realtime_input(audio_stream_end=True)
+            except connection_errors() as e:
+                # Anything else is a bug here, left to the supervisor
+                self.log.warning('Send error', extra={'error': repr(e)})
+                if not await self.resume_session(session):
+                    raise SessionLost('Live API session lost while sending') from e
     
     async def receive_audio(self):
         """Receive audio responses from the Live API"""
         while True:
+            session = self.session
             try:
-                if not self.session:
+                if not session:
                     break
                     
-                turn = self.session.receive()
+                received = False
+                turn = session.receive()
                 async for response in turn:
+                    received = True
+                    self.metrics.mark_response()
+                    if response.usage_metadata:
+                        self.metrics.record_usage(response.usage_metadata)
+                    if update := response.session_resumption_update:
+                        if update.resumable and update.new_handle:
+                            self.resumption_handle = update.new_handle
+                        continue
+                    if response.go_away:
+                        # The server is about to drop us; move to a fresh connection now
+                        task = asyncio.create_task(self.resume_session(session))
+                        self.resume_tasks.add(task)
+                        task.add_done_callback(self.resume_tasks.discard)
+                        continue
                     if data := response.data:
+                        # Never wait for playback here, or interruptions and tool calls would queue behind it
                         self.audio_in_queue.put_nowait(data)
                         continue
+                    if tool_call := response.tool_call:
+                        # Run tools off the receive loop so audio keeps flowing
+                        task = asyncio.create_task(self.handle_tool_call(tool_call))
+                        self.tool_tasks.add(task)
+                        task.add_done_callback(self.tool_tasks.discard)
+                        continue
+                    if server_content := response.server_content:
+                        if server_content.input_transcription and server_content.input_transcription.text:
+                            self.input_transcript.append(server_content.input_transcription.text)
+                        if server_content.output_transcription and server_content.output_transcription.text:
+                            self.output_transcript.append(server_content.output_transcription.text)
+                        if server_content.interrupted:
+                            # Whatever the caller says now belongs to their next turn
+                            self.commit_transcript('bot')
+                            self.flush_playback()
+                            continue
+                        if server_content.turn_complete:
+                            self.turn += 1
+                            self.commit_transcript('user')
+                            self.commit_transcript('bot')
+                            # Marks the end of the reply for the playback engine
+                            self.audio_in_queue.put_nowait(None)
                     if text := response.text:
                         # Emit the bot's text response to frontend
                         timestamp = datetime.now().strftime("%H:%M:%S")
-                        socketio.emit('bot_response', {
+                        self.emit('bot_response', {
                             'text': text, 
                             'timestamp': timestamp
                         })
                 
-                # Clear audio queue on interruption
-                while not self.audio_in_queue.empty():
-                    self.audio_in_queue.get_nowait()
+                if not received:
+                    raise ConnectionError("Live API connection closed")
                     
-            except Exception as e:
-                print(f"Receive error: {e}")
-                break
+            except connection_errors() as e:
+                self.log.warning('Receive error', extra={'error': repr(e)})
+                if not await self.resume_session(session):
+                    raise SessionLost('Live API session lost while receiving') from e
+    
+    async def resume_session(self, failed_session):
+        """Reconnect with the latest resumption handle after a transient disconnect.
+        
+        Before the first turn there is nothing to lose, so without a handle
+        (say, a warm session the server had already dropped) this opens a
+        fresh session instead.
+        """
+        async with self.reconnect_lock:
+            if self.session is not failed_session:
+                # Another task already reconnected (or the session was stopped)
+                return self.session is not None
+            if not self.resumption_handle and self.turn:
+                return False
+            
+            try:
+                await self.session_context.__aexit__(None, None, None)
+            except Exception:
+                pass
+            
+            config = await asyncio.to_thread(live_config.get)
+            if self.resumption_handle:
+                config = {**config, "session_resumption": {"handle": self.resumption_handle}}
+            for attempt in range(SESSION_CONFIG["resume_attempts"]):
+                try:
+                    self.session_context, self.session = await session_pool.connect(config)
+                    self.log.info('Session resumed', extra={'attempt': attempt + 1})
+                    self.emit('status', {'message': 'Reconnected to Gemini Live API'})
+                    return True
+                except Exception as e:
+                    self.log.warning('Resume error', extra={'error': repr(e), 'attempt': attempt + 1})
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+            
+            self.session_context = None
+            self.session = None
+            self.emit('status', {'message': 'Connection to Gemini Live API lost'})
+            return False
+    
+    async def send_text(self, text):
+        """Send a typed user turn, recorded like a transcribed one"""
+        self.input_transcript.append(text)
+        self.commit_transcript('user')
+        await self.session.send_client_content(
+            turns={"role": "user", "parts": [{"text": text}]}, turn_complete=True
+        )
+    
+    async def handle_tool_call(self, tool_call):
+        """Run the requested functions and send all results back in one response"""
+        try:
+            function_responses = await self.tool_dispatcher.dispatch(tool_call.function_calls)
+            await self.session.send_tool_response(function_responses=function_responses)
+        except Exception as e:
+            self.log.error('Tool call error', exc_info=e)
+    
+    def watch_phone(self, phone_number):
+        """Push delivery status changes for this phone number to the caller"""
+        if phone_number in self.delivery_watches:
+            return
+        order_index = self.tool_dispatcher.tools.tools.order_index
+        self.delivery_watches[phone_number] = order_index.subscribe(
+            phone_number, lambda delivery: self.emit('delivery_update', delivery)
+        )
+    
+    def flush_playback(self):
+        """Drop all pending reply audio the moment the caller barges in"""
+        while not self.audio_in_queue.empty():
+            self.audio_in_queue.get_nowait()
+        if self.playback:
+            self.playback.truncate()
+        if self.outbound:
+            self.outbound.reset()
+        if self.io_mode == "browser":
+            self.emit('audio_interrupted', {})
     
     async def play_audio(self):
         """Play audio responses"""
+        if self.io_mode == "browser":
+            # Send the 24 kHz PCM16 reply in the caller's negotiated format
+            while True:
+                bytestream = await self.audio_in_queue.get()
+                if self.outbound is None:
+                    payloads = [bytestream] if bytestream is not None else []
+                elif bytestream is None:
+                    payloads = self.outbound.flush()
+                else:
+                    payloads = self.outbound.process(bytestream)
+                for payload in payloads:
+                    self.emit('audio_response', payload)
+                if bytestream is None:
+                    # Lets the page tell a gap inside a reply (an underrun) from the end of one
+                    self.emit('audio_end', {})
+                if payloads:
+                    # first_audio_ms comes from the page's playback report, not from sending
+                    if (skipped := self.playback_sampler.sample()) is not None:
+                        self.log.debug('Sent reply audio', extra={
+                            'payloads': len(payloads), 'unlogged': skipped,
+                            'queue_ms': self.audio_in_queue.stats()['ms'],
+                        })
+        
+        self.playback = PlaybackEngine(
+            await asyncio.to_thread(get_pya),
+            RECEIVE_SAMPLE_RATE,
+            CHANNELS,
+            frames_per_buffer=AUDIO_CONFIG["playback_frames_per_buffer"],
+            jitter_ms=AUDIO_CONFIG["jitter_buffer_ms"],
+            buffer_ms=AUDIO_CONFIG["playback_buffer_ms"],
+        )
         try:
-            stream = await asyncio.to_thread(
-                pya.open,
-                format=FORMAT,
-                channels=CHANNELS,
-                rate=RECEIVE_SAMPLE_RATE,
-                output=True,
-            )
+            await asyncio.to_thread(self.playback.start)
             
             while True:
                 bytestream = await self.audio_in_queue.get()
-                await asyncio.to_thread(stream.write, bytestream)
-                
-        except Exception as e:
-            print(f"Audio playback error: {e}")
+                if bytestream is None:
+                    self.playback.end_reply()
+                    continue
+                generation = self.playback.generation
+                self.metrics.mark_audio_played()
+                pending = memoryview(bytestream)
+                while pending and generation == self.playback.generation:
+                    pending = pending[self.playback.write(pending):]
+                    if pending:
+                        # Ring buffer is full, wait for the device to drain it
+                        await asyncio.sleep(0.02)
+        finally:
+            # A failure propagates to the supervisor, which starts a fresh engine
+            self.playback.close()
+            self.playback = None
+
+    def collect_metrics(self):
+        """Refresh the gauges and return this session's metrics"""
+        for name, queue in (('out_queue', self.out_queue), ('audio_in_queue', self.audio_in_queue)):
+            if queue is not None:
+                for stat, value in queue.stats().items():
+                    self.metrics.set_gauge(f'{name}_{stat}', value)
+        self.metrics.set_gauge('mic_overflows', self.mic_overflows)
+        self.metrics.set_gauge('playback_underruns', self.playback.underruns if self.playback else self.browser_underruns)
+        if self.vad:
+            self.metrics.set_gauge('vad_drop_ratio', round(self.vad.drop_ratio, 3))
+        self.metrics.set_gauge('task_restarts', sum(self.supervisor.restarts.values()))
+        self.metrics.set_gauge('log_records_dropped', dropped_records())
+        return self.metrics
+    
+    def record_browser_playback(self, report):
+        """Take the page's playback report: when a reply started playing, and underruns so far"""
+        if 'started_in_ms' in report:
+            self.metrics.mark_audio_played(min(max(float(report['started_in_ms']), 0.0), 10000.0))
+        if 'underruns' in report:
+            self.browser_underruns = int(report['underruns'])
+    
+    async def push_metrics(self):
+        """Periodically push this session's metrics to the caller"""
+        while True:
+            await asyncio.sleep(METRICS_CONFIG["push_interval"])
+            self.emit('metrics', self.collect_metrics().snapshot())
+
+class SessionManager:
+    """Registry of active VoiceBot sessions keyed by Socket.IO sid"""
+    
+    def __init__(self, max_sessions):
+        self.max_sessions = max_sessions
+        self._sessions = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+    
+    def get(self, sid):
+        with self._lock:
+            return self._sessions.get(sid)
+    
+    def all(self):
+        with self._lock:
+            return list(self._sessions.values())
+    
+    def get_or_create(self, sid):
+        """Return the caller's VoiceBot, creating one if under the session limit"""
+        with self._lock:
+            voice_bot = self._sessions.get(sid)
+            if voice_bot is None and len(self._sessions) < self.max_sessions:
+                voice_bot = VoiceBot(sid)
+                self._sessions[sid] = voice_bot
+            return voice_bot
+    
+    def remove(self, sid):
+        with self._lock:
+            return self._sessions.pop(sid, None)
+
+sessions = SessionManager(SESSION_CONFIG["max_concurrent_sessions"])
+
+class BackgroundLoop:
+    """Dedicated thread running the event loop shared by every session"""
+    
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """Start the loop thread on first use and return the loop"""
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run, name='voice-loop', daemon=True)
+                self._thread.start()
+            return self.loop
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def call_soon(self, callback, *args):
+        """Run a plain callback on the loop from any thread"""
+        self.start().call_soon_threadsafe(callback, *args)
+    
+    def submit(self, coro):
+        """Schedule a coroutine on the loop from any thread"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.start())
+        future.add_done_callback(self._report_error)
+        return future
+    
+    @staticmethod
+    def _report_error(future):
+        if not future.cancelled() and future.exception():
+            logger.error('Background task error', exc_info=future.exception())
+    
+    def stop(self):
+        """Stop the loop and wait for its thread to exit"""
+        with self._lock:
+            if self.loop is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+            self.loop = None
+            self._thread = None
 
-# Global voice bot instance
-voice_bot = VoiceBot()
+background_loop = BackgroundLoop()
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', jitter_buffer_ms=AUDIO_CONFIG["jitter_buffer_ms"])
+
+async def render_metrics():
+    # The loop thread updates the metrics, so read them there rather than from a request thread
+    return render_prometheus(voice_bot.collect_metrics() for voice_bot in sessions.all())
+
+@app.route('/metrics')
+def metrics():
+    body = background_loop.submit(render_metrics()).result(timeout=METRICS_CONFIG["scrape_timeout"])
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/transcripts/<transcript_id>')
+def transcript(transcript_id):
+    """Page through a session's turns: ?after=<id of the last turn seen>&limit=N.
+
+    The id is the unguessable one sent to the caller's page, not the sid.
+    """
+    after = request.args.get('after', 0, type=int)
+    limit = min(request.args.get('limit', TRANSCRIPT_CONFIG["page_size"], type=int), 500)
+    return jsonify(transcript_store.page(transcript_id, after, limit))
 
 @socketio.on('connect')
 def handle_connect():
-    print('Client connected')
+    logger.info('Client connected', extra={'session': request.sid})
     emit('status', {'message': 'Connected to server'})
 
 @socketio.on('disconnect')
 def handle_disconnect():
-    print('Client disconnected')
+    logger.info('Client disconnected', extra={'session': request.sid})
+    voice_bot = sessions.remove(request.sid)
+    if voice_bot:
+        background_loop.submit(voice_bot.close())
 
 @socketio.on('start_voice')
-def handle_start_voice():
-    """Handle start voice command from frontend"""
-    def run_async():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        async def start_voice_session():
-            # Start session if not already started
-            if not voice_bot.session:
-                success = await voice_bot.start_session()
-                if not success:
-                    return
-            
-            # Start listening
-            await voice_bot.start_listening()
-        
-        loop.run_until_complete(start_voice_session())
+def handle_start_voice(offer=None):
+    """Handle start voice command from frontend, with the client's audio format offer.
+
+    The offer may also carry the caller's phone_number, used to prefetch their orders.
+    """
+    voice_bot = sessions.get_or_create(request.sid)
+    if voice_bot is None:
+        emit('status', {'message': 'Server is busy, please try again later'})
+        return
     
-    thread = threading.Thread(target=run_async)
-    thread.daemon = True
-    thread.start()
+    if voice_bot.io_mode == "browser":
+        background_loop.call_soon(voice_bot.configure_audio, offer)
+    
+    background_loop.submit(voice_bot.start_voice((offer or {}).get('phone_number')))
 
 @socketio.on('stop_voice')
 def handle_stop_voice():
     """Handle stop voice command from frontend"""
-    def run_async():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(voice_bot.stop_listening())
-    
-    thread = threading.Thread(target=run_async)
-    thread.daemon = True
-    thread.start()
+    voice_bot = sessions.get(request.sid)
+    if voice_bot:
+        background_loop.submit(voice_bot.stop_listening())
+
+@socketio.on('audio_chunk')
+def handle_audio_chunk(data):
+    """Handle a 16 kHz PCM16 microphone chunk from the browser"""
+    voice_bot = sessions.get(request.sid)
+    if voice_bot and voice_bot.is_listening:
+        background_loop.call_soon(voice_bot.feed_audio, data)
+
+@socketio.on('playback_stats')
+def handle_playback_stats(report):
+    """The browser's playback report, for first_audio_ms and playback_underruns"""
+    voice_bot = sessions.get(request.sid)
+    if voice_bot and isinstance(report, dict):
+        background_loop.call_soon(voice_bot.record_browser_playback, report)
 
 @socketio.on('simulate_voice_input')
 def handle_simulate_voice():
-    """Simulate voice input for testing"""
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    emit('user_input', {'text': 'Hello, I would like to order some food', 'timestamp': timestamp})
-    emit('bot_response', {'text': 'Hello! I\'d be happy to help you with your food order. What would you like to eat today?', 'timestamp': timestamp})
+    """Send a typed test utterance to the live session in place of speech"""
+    voice_bot = sessions.get(request.sid)
+    if voice_bot is None or voice_bot.session is None:
+        emit('status', {'message': 'Start voice before sending a test message'})
+        return
+    background_loop.submit(voice_bot.send_text('Hello, I would like to order some food'))
+
+startup_timings.record('import_app', (time.perf_counter() - _import_started) * 1000)
+
+def start_worker():
+    """Start this process's event loop thread and warm session pool"""
+    with startup_timings.measure('start_worker'):
+        atexit.register(configure_logging().stop)
+        background_loop.start()
+        background_loop.call_soon(session_pool.replenish)
+        atexit.register(background_loop.stop)
+        # Runs before the loop stops so buffered turns reach the store
+        atexit.register(lambda: background_loop.submit(transcript_writer.flush()).result(timeout=5))
+    logger.info('Startup timings', extra={'pid': os.getpid(), 'phases_ms': {
+        phase: round(ms, 1) for phase, ms in startup_timings.phases.items()
+    }})
 
 if __name__ == '__main__':
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Single-process development server; see run.py for multi-worker deployments
+    start_worker()
+    socketio.run(app, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
\ No newline at end of file
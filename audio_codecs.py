@@ -0,0 +1,234 @@
+import math
+
+import numpy as np
+
+CODECS = ('opus', 'mulaw', 'pcm16')
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def _mulaw_decode_table():
+    code = ~np.arange(256) & 0xFF
+    exponent = (code >> 4) & 0x07
+    magnitude = (((code & 0x0F) << 3) + _MULAW_BIAS << exponent) - _MULAW_BIAS
+    return np.where(code & 0x80, -magnitude, magnitude).astype(np.int16)
+
+
+_MULAW_TABLE = _mulaw_decode_table()
+
+
+def mulaw_decode(payload):
+    """G.711 mu-law bytes to PCM16 bytes"""
+    return _MULAW_TABLE[np.frombuffer(payload, dtype=np.uint8)].tobytes()
+
+
+def mulaw_encode(pcm):
+    """PCM16 bytes to G.711 mu-law bytes"""
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.int32)
+    sign = (samples < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(samples), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = np.floor(np.log2(magnitude)).astype(np.int32) - 7
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    return (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8).tobytes()
+
+
+def opus_available():
+    try:
+        import opuslib  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class PolyphaseResampler:
+    """Streaming rational-ratio resampler for PCM16.
+
+    The rate ratio is reduced to up/down factors and a Kaiser-windowed sinc
+    low-pass is split into `up` phases, so each output sample is a single
+    dot product over the input, computed for a whole chunk at once. Filter
+    history carries over between chunks, so a stream can be fed in pieces
+    of any size.
+    """
+
+    def __init__(self, from_rate, to_rate, taps=16, beta=8.0):
+        divisor = math.gcd(from_rate, to_rate)
+        self.up = to_rate // divisor
+        self.down = from_rate // divisor
+        # Longer filters when decimating so the narrower passband stays sharp
+        self.taps = taps * max(1, -(-self.down // self.up))
+        length = self.up * self.taps
+        cutoff = 0.45 / max(self.up, self.down)
+        n = np.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(length, beta) * self.up
+        # bank[phase, k] weights input sample i - k for outputs on that phase
+        self.bank = prototype.reshape(self.taps, self.up).T.astype(np.float32)
+        self.reset()
+
+    def reset(self):
+        self._history = np.zeros(self.taps - 1, dtype=np.float32)
+        self._consumed = 0
+        self._next = 0
+
+    def process(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        extended = np.concatenate([self._history, samples])
+        total = self._consumed + len(samples)
+
+        # Output k sits at position next + k * down on the upsampled grid
+        count = max(0, -(-(total * self.up - self._next) // self.down))
+        grid = self._next + self.down * np.arange(count, dtype=np.int64)
+        positions = grid // self.up - (self._consumed - len(self._history))
+        windows = extended[positions[:, None] - np.arange(self.taps)]
+        out = np.einsum('nk,nk->n', windows, self.bank[grid % self.up])
+
+        self._next += self.down * count
+        self._consumed = total
+        self._history = extended[len(extended) - (self.taps - 1):]
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16).tobytes()
+
+
+class PCM16Codec:
+    name = 'pcm16'
+
+    def decode(self, payload):
+        return bytes(payload)
+
+    def encode(self, pcm):
+        return [pcm] if pcm else []
+
+    def flush(self):
+        return []
+
+    def reset(self):
+        pass
+
+
+class MulawCodec(PCM16Codec):
+    name = 'mulaw'
+
+    def decode(self, payload):
+        return mulaw_decode(payload)
+
+    def encode(self, pcm):
+        return [mulaw_encode(pcm)] if pcm else []
+
+
+class OpusCodec:
+    """Opus in fixed-size packets; needs the optional opuslib package"""
+
+    name = 'opus'
+
+    def __init__(self, rate, frame_ms=20):
+        import opuslib
+
+        self.rate = rate
+        self.frame_bytes = rate * frame_ms // 1000 * 2
+        self.decoder = opuslib.Decoder(rate, 1)
+        self.encoder = opuslib.Encoder(rate, 1, opuslib.APPLICATION_VOIP)
+        self._pending = bytearray()
+
+    def decode(self, payload):
+        # 120 ms is the longest packet Opus allows
+        return self.decoder.decode(bytes(payload), self.rate * 120 // 1000)
+
+    def encode(self, pcm):
+        self._pending += pcm
+        packets = []
+        while len(self._pending) >= self.frame_bytes:
+            packets.append(self.encoder.encode(bytes(self._pending[:self.frame_bytes]), self.frame_bytes // 2))
+            del self._pending[:self.frame_bytes]
+        return packets
+
+    def flush(self):
+        """Pad and send the partial packet left at the end of a reply"""
+        if not self._pending:
+            return []
+        return self.encode(bytes(self.frame_bytes - len(self._pending)))
+
+    def reset(self):
+        self._pending.clear()
+
+
+def create_codec(name, rate):
+    if name == 'opus':
+        return OpusCodec(rate)
+    if name == 'mulaw':
+        return MulawCodec()
+    if name == 'pcm16':
+        return PCM16Codec()
+    raise ValueError(f"Unknown codec: {name}")
+
+
+def _pick_rate(rates, target, prefer_lower):
+    """The target rate if offered, else the nearest one on the preferred side"""
+    if not rates or target in rates:
+        return target
+    lower = [rate for rate in rates if rate < target]
+    higher = [rate for rate in rates if rate > target]
+    if prefer_lower:
+        return max(lower) if lower else min(higher)
+    return min(higher) if higher else max(lower)
+
+
+def negotiate(offer, input_rate, output_rate, preference=CODECS):
+    """Choose the codec and sample rate for each direction of one connection.
+
+    offer is {"input": {"codecs": [...], "sample_rates": [...]}, "output": {...}}
+    as sent by the client; anything left out means PCM16 at the model's
+    rates. The first codec in preference that the client also supports is
+    used. Opus always runs at the model's rates, because any Opus decoder
+    can output any rate. Other codecs use the model's rate when the client
+    supports it. Otherwise input takes the closest rate above the model's
+    and output the closest rate below, so audio is never upsampled only to
+    be thrown away.
+    """
+    offer = offer or {}
+    available = [codec for codec in preference if codec != 'opus' or opus_available()]
+    chosen = {}
+    for direction, model_rate in (('input', input_rate), ('output', output_rate)):
+        side = offer.get(direction) or {}
+        codecs = side.get('codecs') or ['pcm16']
+        codec = next((codec for codec in available if codec in codecs), 'pcm16')
+        if codec == 'opus':
+            rate = model_rate
+        else:
+            rate = _pick_rate([int(rate) for rate in side.get('sample_rates') or []], model_rate,
+                              prefer_lower=direction == 'output')
+        chosen[direction] = {'codec': codec, 'sample_rate': rate}
+    return chosen
+
+
+class InboundAudio:
+    """Client payloads to PCM16 at the model's input rate"""
+
+    def __init__(self, codec, client_rate, model_rate):
+        self.codec = create_codec(codec, client_rate)
+        self.resampler = PolyphaseResampler(client_rate, model_rate) if client_rate != model_rate else None
+
+    def process(self, payload):
+        pcm = self.codec.decode(payload)
+        return self.resampler.process(pcm) if self.resampler else pcm
+
+
+class OutboundAudio:
+    """Model PCM16 to payloads in the client's codec and rate"""
+
+    def __init__(self, codec, client_rate, model_rate):
+        self.codec = create_codec(codec, client_rate)
+        self.resampler = PolyphaseResampler(model_rate, client_rate) if client_rate != model_rate else None
+
+    def process(self, pcm):
+        if self.resampler:
+            pcm = self.resampler.process(pcm)
+        return self.codec.encode(pcm)
+
+    def flush(self):
+        return self.codec.flush()
+
+    def reset(self):
+        """Forget buffered audio after a barge-in"""
+        self.codec.reset()
+        if self.resampler:
+            self.resampler.reset()
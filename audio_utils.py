@@ -0,0 +1,476 @@
+import asyncio
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class AudioFrame:
+    """One PCM16 mic chunk on its way to the Live API.
+
+    The buffer is either the bytes the audio backend returned, wrapped
+    without a copy, or a pooled bytearray filled through readinto. release()
+    hands pooled buffers back for reuse.
+    """
+
+    __slots__ = ('buffer', 'length', 'enqueued_at', 'pool')
+
+    def __init__(self, buffer, length=None, pool=None):
+        self.buffer = buffer
+        self.length = len(buffer) if length is None else length
+        self.enqueued_at = 0.0
+        self.pool = pool
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def view(self):
+        return memoryview(self.buffer)[:self.length]
+
+    def release(self):
+        if self.pool is not None:
+            self.pool.release(self.buffer)
+            self.pool = None
+        self.buffer = None
+
+
+class FramePool:
+    """Free list of fixed-size bytearrays reused for mic frames"""
+
+    def __init__(self, frame_bytes, max_free=64):
+        self.frame_bytes = frame_bytes
+        self.max_free = max_free
+        self.allocated = 0
+        self._free = []
+
+    def acquire(self):
+        if self._free:
+            return self._free.pop()
+        self.allocated += 1
+        return bytearray(self.frame_bytes)
+
+    def release(self, buffer):
+        if len(buffer) == self.frame_bytes and len(self._free) < self.max_free:
+            self._free.append(buffer)
+
+    def read_frame(self, source):
+        """Fill a pooled buffer from a readinto-capable source; None at end of stream"""
+        buffer = self.acquire()
+        count = source.readinto(buffer)
+        if not count:
+            self.release(buffer)
+            return None
+        return AudioFrame(buffer, count, self)
+
+
+def pcm_view(frame):
+    """The raw PCM of an AudioFrame or a plain bytes-like chunk"""
+    return frame.view if isinstance(frame, AudioFrame) else frame
+
+
+def coalesce(frames):
+    """Join frames into one payload and recycle their buffers"""
+    if len(frames) == 1:
+        frame = frames[0]
+        if isinstance(frame.buffer, bytes) and frame.length == len(frame.buffer):
+            # Immutable and never pooled, so it can go out without a copy
+            data = frame.buffer
+        else:
+            data = bytes(frame.view)
+    else:
+        data = b''.join([frame.view for frame in frames])
+    for frame in frames:
+        frame.release()
+    return data
+
+
+QUEUE_POLICIES = ('block', 'drop_oldest', 'drop_newest', 'coalesce')
+
+
+def _audio_bytes(item):
+    # Turn markers (None, AUDIO_STREAM_END) carry no audio and are never dropped
+    return len(item) if isinstance(item, (AudioFrame, bytes, bytearray, memoryview)) else 0
+
+
+class AudioQueue(asyncio.Queue):
+    """asyncio.Queue bounded by milliseconds of PCM16 audio instead of item count.
+
+    When a chunk would push the queue past max_ms the policy decides what
+    gives: "block" makes put() wait for the consumer (put_nowait, which
+    cannot wait, drops the new chunk), "drop_oldest" evicts the oldest
+    chunks, "drop_newest" discards the incoming chunk and "coalesce" merges
+    the queued chunks with it into one and trims the oldest audio to fit.
+    """
+
+    def __init__(self, max_ms, rate, policy='drop_oldest', sample_width=2):
+        if policy not in QUEUE_POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        super().__init__()
+        self.policy = policy
+        self.sample_width = sample_width
+        self.bytes_per_ms = rate * sample_width / 1000
+        self.max_bytes = int(max_ms * self.bytes_per_ms)
+        self.queued_bytes = 0
+        self.overflows = 0
+        self.dropped = 0
+        self.dropped_ms = 0.0
+        self.high_water_ms = 0.0
+        self._space = asyncio.Event()
+
+    @property
+    def queued_ms(self):
+        return self.queued_bytes / self.bytes_per_ms
+
+    def stats(self):
+        return {
+            'depth': self.qsize(),
+            'ms': round(self.queued_ms, 1),
+            'high_water_ms': round(self.high_water_ms, 1),
+            'overflows': self.overflows,
+            'dropped': self.dropped,
+            'dropped_ms': round(self.dropped_ms, 1),
+        }
+
+    def _overflowing(self, size):
+        return size and self.queued_bytes and self.queued_bytes + size > self.max_bytes
+
+    async def put(self, item):
+        size = _audio_bytes(item)
+        if self.policy == 'block' and self._overflowing(size):
+            self.overflows += 1
+            while self._overflowing(size):
+                self._space.clear()
+                await self._space.wait()
+            super().put_nowait(item)
+            return
+        self.put_nowait(item)
+
+    def put_nowait(self, item):
+        size = _audio_bytes(item)
+        if self._overflowing(size):
+            self.overflows += 1
+            if self.policy in ('block', 'drop_newest'):
+                self._discard(item, size)
+                return
+            if self.policy == 'coalesce':
+                item = self._merge_tail(item)
+                size = len(item)
+            self._evict(self.queued_bytes + size - self.max_bytes)
+            if self.policy == 'coalesce':
+                item = self._trim(item, self.queued_bytes + size - self.max_bytes)
+        super().put_nowait(item)
+
+    def _put(self, item):
+        self._queue.append(item)
+        self.queued_bytes += _audio_bytes(item)
+        self.high_water_ms = max(self.high_water_ms, self.queued_ms)
+
+    def _get(self):
+        item = self._queue.popleft()
+        self.queued_bytes -= _audio_bytes(item)
+        self._space.set()
+        return item
+
+    def _discard(self, item, size):
+        self.dropped += 1
+        self.dropped_ms += size / self.bytes_per_ms
+        if isinstance(item, AudioFrame):
+            item.release()
+
+    def _evict(self, excess):
+        """Drop the oldest queued audio until excess bytes are freed"""
+        kept = deque()
+        for queued in self._queue:
+            size = _audio_bytes(queued)
+            if excess > 0 and size:
+                excess -= size
+                self.queued_bytes -= size
+                self._discard(queued, size)
+            else:
+                kept.append(queued)
+        self._queue = kept
+
+    def _merge_tail(self, item):
+        """Pull the run of audio at the back of the queue and join it with item"""
+        chunks = [item]
+        while self._queue and _audio_bytes(self._queue[-1]):
+            chunks.append(self._queue.pop())
+        chunks.reverse()
+        enqueued_at = chunks[0].enqueued_at if isinstance(chunks[0], AudioFrame) else None
+        data = b''.join([pcm_view(chunk) for chunk in chunks])
+        for chunk in chunks:
+            if chunk is not item:
+                self.queued_bytes -= len(chunk)
+            if isinstance(chunk, AudioFrame):
+                chunk.release()
+        if enqueued_at is None:
+            return data
+        merged = AudioFrame(data)
+        merged.enqueued_at = enqueued_at
+        return merged
+
+    def _trim(self, item, excess):
+        """Cut excess bytes, whole samples only, off the front of a merged chunk"""
+        if excess <= 0:
+            return item
+        excess = min(len(item), -(-excess // self.sample_width) * self.sample_width)
+        self.dropped_ms += excess / self.bytes_per_ms
+        if isinstance(item, AudioFrame):
+            trimmed = AudioFrame(item.buffer[excess:])
+            trimmed.enqueued_at = item.enqueued_at
+            return trimmed
+        return item[excess:]
+
+
+class RingBuffer:
+    """Preallocated byte ring buffer shared by one producer and one consumer thread"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._read_pos = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def free(self):
+        return self.capacity - self._size
+
+    def write(self, data):
+        """Copy as much of data as fits and return the number of bytes written"""
+        data = memoryview(data).cast('B')
+        with self._lock:
+            count = min(len(data), self.capacity - self._size)
+            start = (self._read_pos + self._size) % self.capacity
+            first = min(count, self.capacity - start)
+            self._view[start:start + first] = data[:first]
+            self._view[:count - first] = data[first:count]
+            self._size += count
+            return count
+
+    def readinto(self, out):
+        """Fill out from the buffer and return the number of bytes copied"""
+        out = memoryview(out).cast('B')
+        with self._lock:
+            count = min(len(out), self._size)
+            start = self._read_pos
+            first = min(count, self.capacity - start)
+            out[:first] = self._view[start:start + first]
+            out[first:count] = self._view[:count - first]
+            self._read_pos = (start + count) % self.capacity
+            self._size -= count
+            return count
+
+    def clear(self):
+        with self._lock:
+            self._read_pos = 0
+            self._size = 0
+
+
+class PlaybackEngine:
+    """Callback-mode PyAudio output fed from a ring buffer with a jitter buffer.
+
+    Playback starts once jitter_ms of audio is buffered. After an underrun it
+    waits for the buffer to refill again. truncate() drops everything queued,
+    so on barge-in at most one device buffer of stale audio is heard.
+    """
+
+    def __init__(self, pya, rate, channels=1, frames_per_buffer=256, jitter_ms=60, buffer_ms=2000):
+        self.pya = pya
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.frame_bytes = 2 * channels
+        self.jitter_bytes = self.ms_to_bytes(jitter_ms)
+        self.ring = RingBuffer(self.ms_to_bytes(buffer_ms))
+        self.stream = None
+        self.underruns = 0
+        self.generation = 0
+        self._primed = False
+        self._reply_done = True
+        self._out = bytearray(frames_per_buffer * self.frame_bytes)
+        self._continue = None
+
+    def ms_to_bytes(self, ms):
+        return int(self.rate * ms / 1000) * self.frame_bytes
+
+    def start(self):
+        import pyaudio
+
+        self._continue = pyaudio.paContinue
+        self.stream = self.pya.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            output=True,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+        self.stream.start_stream()
+
+    def write(self, data):
+        """Queue PCM for playback and return the number of bytes accepted"""
+        self._reply_done = False
+        return self.ring.write(data)
+
+    def end_reply(self):
+        """Mark the reply as fully queued so draining the buffer isn't an underrun"""
+        self._reply_done = True
+
+    def truncate(self):
+        """Drop all queued audio immediately"""
+        self.generation += 1
+        self._reply_done = True
+        self.ring.clear()
+        self._primed = False
+
+    def close(self):
+        if self.stream:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        nbytes = frame_count * self.frame_bytes
+        if len(self._out) < nbytes:
+            self._out = bytearray(nbytes)
+        out = memoryview(self._out)[:nbytes]
+
+        if not self._primed and len(self.ring) >= self.jitter_bytes:
+            self._primed = True
+
+        copied = self.ring.readinto(out) if self._primed else 0
+        if copied < nbytes:
+            out[copied:] = bytes(nbytes - copied)
+            if self._primed:
+                if not self._reply_done:
+                    # Ran dry mid-reply: rebuild the jitter buffer before resuming
+                    self.underruns += 1
+                self._primed = False
+        return bytes(out), self._continue
+
+
+class EnergyVAD:
+    """Energy detector over int16 PCM with an adaptive noise floor"""
+
+    def __init__(self, threshold_db=-45.0, margin_db=10.0):
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.noise_floor_db = threshold_db - margin_db
+
+    def is_speech(self, frame):
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        if not samples.size:
+            return False
+        rms = np.sqrt(np.mean(samples * samples))
+        level_db = 20 * np.log10(max(rms, 1.0) / 32768)
+        speech = level_db > max(self.threshold_db, self.noise_floor_db + self.margin_db)
+        if not speech:
+            # Track background noise slowly so steady hum doesn't count as speech
+            self.noise_floor_db += 0.05 * (level_db - self.noise_floor_db)
+        return speech
+
+
+class WebRTCVAD:
+    """Majority vote of webrtcvad over 20 ms sub-frames; needs the optional webrtcvad package"""
+
+    def __init__(self, rate, aggressiveness=2):
+        import webrtcvad
+
+        self.rate = rate
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.subframe_bytes = rate // 50 * 2
+
+    def is_speech(self, frame):
+        frame = memoryview(frame).cast('B')
+        count = len(frame) // self.subframe_bytes
+        if not count:
+            return False
+        votes = sum(
+            self.vad.is_speech(bytes(frame[i * self.subframe_bytes:(i + 1) * self.subframe_bytes]), self.rate)
+            for i in range(count)
+        )
+        return votes * 2 >= count
+
+
+class VADGate:
+    """Drops silent mic frames, keeping pre-roll before speech and hangover after it"""
+
+    def __init__(self, vad, rate, hangover_ms=300, preroll_ms=200):
+        self.vad = vad
+        self.rate = rate
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.active = False
+        self.frames_total = 0
+        self.frames_dropped = 0
+        self._silence_ms = 0.0
+        self._preroll = deque()
+        self._preroll_ms = 0.0
+
+    def frame_ms(self, frame):
+        return len(frame) / 2 / self.rate * 1000
+
+    @property
+    def drop_ratio(self):
+        return self.frames_dropped / self.frames_total if self.frames_total else 0.0
+
+    def stats(self):
+        return {
+            'frames_total': self.frames_total,
+            'frames_dropped': self.frames_dropped,
+            'drop_ratio': self.drop_ratio,
+        }
+
+    def process(self, frame):
+        """Return (frames to send, whether speech just ended)"""
+        self.frames_total += 1
+        if self.vad.is_speech(pcm_view(frame)):
+            frames = [*self._preroll, frame]
+            self.frames_dropped -= len(self._preroll)
+            self._preroll.clear()
+            self._preroll_ms = 0.0
+            self._silence_ms = 0.0
+            self.active = True
+            return frames, False
+
+        if self.active:
+            self._silence_ms += self.frame_ms(frame)
+            if self._silence_ms <= self.hangover_ms:
+                return [frame], False
+            self.active = False
+            self._hold(frame)
+            return [], True
+
+        self._hold(frame)
+        return [], False
+
+    def _hold(self, frame):
+        # Keep the most recent silence around in case speech starts next
+        self.frames_dropped += 1
+        self._preroll.append(frame)
+        self._preroll_ms += self.frame_ms(frame)
+        while self._preroll and self._preroll_ms - self.frame_ms(self._preroll[0]) >= self.preroll_ms:
+            evicted = self._preroll.popleft()
+            self._preroll_ms -= self.frame_ms(evicted)
+            if isinstance(evicted, AudioFrame):
+                evicted.release()
+
+
+def create_vad_gate(config, rate):
+    """Build the VAD stage named by config["vad"], or None when disabled"""
+    kind = config.get("vad")
+    if not kind:
+        return None
+    if kind == "webrtc":
+        vad = WebRTCVAD(rate, config.get("vad_aggressiveness", 2))
+    elif kind == "energy":
+        vad = EnergyVAD(config.get("vad_threshold_db", -45.0))
+    else:
+        raise ValueError(f"Unknown VAD: {kind}")
+    return VADGate(vad, rate, config.get("vad_hangover_ms", 300), config.get("vad_preroll_ms", 200))
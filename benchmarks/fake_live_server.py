@@ -0,0 +1,191 @@
+"""Local websocket stand-in for the Gemini Live API.
+
+Speaks just enough of the BidiGenerateContent protocol for app.py: it
+acknowledges setup, waits for audio_stream_end, optionally injects a
+tool_call and waits for its tool_response, then streams a synthesized
+24 kHz PCM16 reply with canned transcriptions, followed by turn_complete
+and a session resumption handle.
+
+    python -m benchmarks.fake_live_server --port 8765 --response-delay-ms 300
+
+The google-genai client always dials wss:// when it has an API key, so the
+server speaks TLS with a self-signed certificate. Point app.py at it with
+LIVE_API_BASE_URL=https://127.0.0.1:8765 and SSL_CERT_FILE set to the
+certificate path printed on startup (benchmarks.serve does both).
+"""
+
+import argparse
+import asyncio
+import base64
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import tempfile
+
+import numpy as np
+import websockets
+
+RECEIVE_SAMPLE_RATE = 24000
+
+
+def self_signed_cert(host="127.0.0.1", directory=None):
+    """Write a throwaway certificate and key for host; returns (cert_path, key_path)"""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, host)])
+    try:
+        alt_name = x509.IPAddress(ipaddress.ip_address(host))
+    except ValueError:
+        alt_name = x509.DNSName(host)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=5))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([alt_name]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    directory = directory or tempfile.mkdtemp(prefix="fake-live-tls-")
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return cert_path, key_path
+
+
+def server_ssl_context(cert_path, key_path):
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_path, key_path)
+    return context
+
+
+def _field(message, camel, snake):
+    return message.get(camel) if camel in message else message.get(snake)
+
+
+def synthesize_reply(duration_ms, frequency=220.0, rate=RECEIVE_SAMPLE_RATE):
+    """A plain tone standing in for the model's spoken reply"""
+    t = np.arange(int(rate * duration_ms / 1000)) / rate
+    return (np.sin(2 * np.pi * frequency * t) * 8000).astype(np.int16).tobytes()
+
+
+class FakeLiveServer:
+    def __init__(self, response_delay_ms=300, reply_ms=1500, chunk_ms=40, tool_call_every=0,
+                 tool_name="get_menu_items", realtime=True):
+        self.response_delay_ms = response_delay_ms
+        self.chunk_ms = chunk_ms
+        self.tool_call_every = tool_call_every
+        self.tool_name = tool_name
+        self.realtime = realtime
+        self.reply = synthesize_reply(reply_ms)
+        self.connections = 0
+
+    async def handler(self, websocket):
+        self.connections += 1
+        pending_tools = {}
+        responders = set()
+        turn = 0
+        try:
+            await websocket.recv()  # setup
+            await websocket.send(json.dumps({"setupComplete": {}}))
+
+            async for raw in websocket:
+                message = json.loads(raw)
+                realtime_input = _field(message, "realtimeInput", "realtime_input") or {}
+                if _field(realtime_input, "audioStreamEnd", "audio_stream_end"):
+                    turn += 1
+                    task = asyncio.create_task(self.respond(websocket, turn, pending_tools))
+                    responders.add(task)
+                    task.add_done_callback(responders.discard)
+
+                tool_response = _field(message, "toolResponse", "tool_response")
+                if tool_response:
+                    for response in _field(tool_response, "functionResponses", "function_responses") or []:
+                        future = pending_tools.pop(response.get("id"), None)
+                        if future and not future.done():
+                            future.set_result(response)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in responders:
+                task.cancel()
+            self.connections -= 1
+
+    async def respond(self, websocket, turn, pending_tools):
+        await asyncio.sleep(self.response_delay_ms / 1000)
+        await websocket.send(json.dumps({
+            "serverContent": {"inputTranscription": {"text": "I'd like a classic burger and fries."}}
+        }))
+
+        if self.tool_call_every and turn % self.tool_call_every == 0:
+            call_id = f"call-{turn}"
+            future = asyncio.get_running_loop().create_future()
+            pending_tools[call_id] = future
+            await websocket.send(json.dumps({
+                "toolCall": {"functionCalls": [{"id": call_id, "name": self.tool_name, "args": {}}]}
+            }))
+            await asyncio.wait_for(future, timeout=30)
+
+        chunk_bytes = int(RECEIVE_SAMPLE_RATE * self.chunk_ms / 1000) * 2
+        for start in range(0, len(self.reply), chunk_bytes):
+            chunk = self.reply[start:start + chunk_bytes]
+            await websocket.send(json.dumps({
+                "serverContent": {"modelTurn": {"parts": [{"inlineData": {
+                    "mimeType": f"audio/pcm;rate={RECEIVE_SAMPLE_RATE}",
+                    "data": base64.b64encode(chunk).decode(),
+                }}]}}
+            }))
+            if self.realtime:
+                # The real API streams somewhat faster than playback speed
+                await asyncio.sleep(self.chunk_ms / 1000 / 2)
+
+        await websocket.send(json.dumps({
+            "serverContent": {"outputTranscription": {"text": "Sure, one Classic Burger and French Fries."}}
+        }))
+        await websocket.send(json.dumps({"serverContent": {"turnComplete": True}}))
+        await websocket.send(json.dumps({
+            "sessionResumptionUpdate": {"newHandle": f"handle-{id(websocket)}-{turn}", "resumable": True}
+        }))
+
+    async def serve(self, host="127.0.0.1", port=8765, ssl_context=None):
+        async with websockets.serve(self.handler, host, port, max_size=None, ssl=ssl_context):
+            await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--response-delay-ms", type=int, default=300)
+    parser.add_argument("--reply-ms", type=int, default=1500)
+    parser.add_argument("--tool-call-every", type=int, default=0, help="inject a tool_call every N turns (0 = never)")
+    args = parser.parse_args()
+
+    server = FakeLiveServer(
+        response_delay_ms=args.response_delay_ms,
+        reply_ms=args.reply_ms,
+        tool_call_every=args.tool_call_every,
+    )
+    cert_path, key_path = self_signed_cert(args.host)
+    print(f"Serving wss://{args.host}:{args.port} with certificate {cert_path}")
+    print(f"  LIVE_API_BASE_URL=https://{args.host}:{args.port} SSL_CERT_FILE={cert_path}")
+    asyncio.run(server.serve(args.host, args.port, server_ssl_context(cert_path, key_path)))
+
+
+if __name__ == "__main__":
+    main()
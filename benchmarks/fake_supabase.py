@@ -0,0 +1,149 @@
+"""In-memory stand-in for the Supabase client behind SupabaseFoodOrderingTools.
+
+Supports the slice of the postgrest query builder that sql_utils uses
+(select/insert/delete with eq and in_ filters, plus the orders(*) join),
+with a configurable per-request latency to mimic the network round trip.
+"""
+
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+from sql_utils import SupabaseFoodOrderingTools
+
+SEED_MENU = [
+    {"item_id": 1, "category": "Mains", "name": "Classic Burger", "description": "Beef patty, cheddar, pickles", "price": 9.99, "is_available": True},
+    {"item_id": 2, "category": "Mains", "name": "Crispy Chicken Sandwich", "description": "Fried chicken, slaw, spicy mayo", "price": 10.49, "is_available": True},
+    {"item_id": 3, "category": "Mains", "name": "Margherita Pizza", "description": "Tomato, mozzarella, basil", "price": 12.50, "is_available": True},
+    {"item_id": 4, "category": "Sides", "name": "French Fries", "description": "Skin-on, sea salt", "price": 3.49, "is_available": True},
+    {"item_id": 5, "category": "Sides", "name": "Onion Rings", "description": "Beer battered", "price": 3.99, "is_available": True},
+    {"item_id": 6, "category": "Beverages", "name": "Coca-Cola", "description": "Large, 24 oz", "price": 2.29, "is_available": True},
+    {"item_id": 7, "category": "Beverages", "name": "Lemonade", "description": "Fresh squeezed", "price": 2.99, "is_available": True},
+    {"item_id": 8, "category": "Desserts", "name": "Chocolate Brownie", "description": "Warm, with fudge sauce", "price": 4.49, "is_available": True},
+    {"item_id": 9, "category": "Desserts", "name": "Cheesecake", "description": "New York style", "price": 5.25, "is_available": False},
+]
+
+PRIMARY_KEYS = {"menu": "item_id", "orders": "order_id", "deliveries": "order_id"}
+
+
+class _Query:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.operation = "select"
+        self.columns = "*"
+        self.payload = None
+        self.filters = []
+
+    def select(self, columns="*"):
+        self.operation = "select"
+        self.columns = columns
+        return self
+
+    def insert(self, payload):
+        self.operation = "insert"
+        self.payload = payload
+        return self
+
+    def update(self, payload):
+        self.operation = "update"
+        self.payload = payload
+        return self
+
+    def delete(self):
+        self.operation = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: str(row.get(column)) == str(value))
+        return self
+
+    def in_(self, column, values):
+        wanted = {str(value) for value in values}
+        self.filters.append(lambda row: str(row.get(column)) in wanted)
+        return self
+
+    def execute(self):
+        time.sleep(self.client.latency_ms / 1000)
+        self.client.requests += 1
+        with self.client.lock:
+            data = getattr(self, f"_{self.operation}")()
+        if self.operation != "select":
+            self.client.publish(self.table, self.operation.upper(), data)
+        return SimpleNamespace(data=data)
+
+    def _matches(self, row):
+        return all(condition(row) for condition in self.filters)
+
+    def _select(self):
+        rows = [dict(row) for row in self.client.tables[self.table] if self._matches(row)]
+        if self.table == "deliveries" and "orders(" in self.columns:
+            orders = {row["order_id"]: row for row in self.client.tables["orders"]}
+            for row in rows:
+                row["orders"] = dict(orders.get(row["order_id"], {}))
+        return rows
+
+    def _insert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        inserted = []
+        for row in rows:
+            row = dict(row)
+            key = PRIMARY_KEYS[self.table]
+            if key not in row:
+                row[key] = next(self.client.ids[self.table])
+            if any(existing[key] == row[key] for existing in self.client.tables[self.table]):
+                raise ValueError(f"duplicate key value violates unique constraint on {self.table}.{key}")
+            self.client.tables[self.table].append(row)
+            inserted.append(dict(row))
+        return inserted
+
+    def _update(self):
+        updated = []
+        for row in self.client.tables[self.table]:
+            if self._matches(row):
+                row.update(self.payload)
+                updated.append(dict(row))
+        return updated
+
+    def _delete(self):
+        table = self.client.tables[self.table]
+        removed = [row for row in table if self._matches(row)]
+        table[:] = [row for row in table if not self._matches(row)]
+        return removed
+
+
+class FakeSupabaseClient:
+    def __init__(self, latency_ms=40, menu=SEED_MENU):
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.tables = {"menu": [dict(item) for item in menu], "orders": [], "deliveries": []}
+        self.ids = {"menu": itertools.count(1000), "orders": itertools.count(1), "deliveries": itertools.count(1)}
+        self.listeners = {}
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def on_change(self, table, listener):
+        """Emulates a realtime subscription: listener(event_type, record) after each write"""
+        self.listeners.setdefault(table, []).append(listener)
+
+    def publish(self, table, event_type, rows):
+        for listener in self.listeners.get(table, []):
+            for row in rows:
+                listener(event_type, dict(row))
+
+
+class FakeSupabaseFoodOrderingTools(SupabaseFoodOrderingTools):
+    """SupabaseFoodOrderingTools running against FakeSupabaseClient instead of the network"""
+
+    def __init__(self, latency_ms=40, warm_menu_cache=False, journal=None):
+        super().__init__(warm_menu_cache=warm_menu_cache, client=FakeSupabaseClient(latency_ms), journal=journal)
+        # Stand-in for SupabaseDeliveryFeed
+        self.supabase.on_change("deliveries", self.order_index.apply_change)
+        self.supabase.on_change("menu", lambda event_type, record: self.menu_cache.invalidate())
+        self.order_index.set_live(True)
+
+    def set_delivery_status(self, order_id, status):
+        self.supabase.table("deliveries").update({"status": status}).eq("order_id", order_id).execute()
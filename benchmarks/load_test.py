@@ -0,0 +1,227 @@
+"""Concurrent-caller load test for app.py.
+
+Starts benchmarks.serve (fake Live API + fake Supabase) unless --url is
+given, then ramps through the requested session counts. Each simulated
+caller connects over Socket.IO, streams PCM in real time the way the
+browser does, and measures turn latency: the time from the end of its
+speech to the first audio_response. For every step it reports p50/p95/p99
+latency and server CPU and memory per session, then names the first step
+where p95 degrades past --degrade-factor times the baseline.
+
+    python -m benchmarks.load_test --sessions 1,5,10,20,40 --turns 3
+    python -m benchmarks.load_test --pcm recorded_16k_mono.pcm
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+import psutil
+import socketio
+
+SEND_SAMPLE_RATE = 16000
+CHUNK_SIZE = 1024
+CHUNK_SECONDS = CHUNK_SIZE / SEND_SAMPLE_RATE
+
+
+def load_pcm(path):
+    """Read 16 kHz mono PCM16 from a .wav or raw .pcm file"""
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as wav:
+            if wav.getframerate() != SEND_SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                raise ValueError(f"{path} must be 16 kHz mono PCM16")
+            return wav.readframes(wav.getnframes())
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def synthesize_utterance(duration_s=1.5):
+    """Tone bursts loud enough to pass the VAD, standing in for speech"""
+    t = np.arange(int(SEND_SAMPLE_RATE * duration_s)) / SEND_SAMPLE_RATE
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)
+    return (np.sin(2 * np.pi * 180 * t) * envelope * 6000).astype(np.int16).tobytes()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+class Caller:
+    def __init__(self, url, utterance, turns, turn_timeout):
+        self.url = url
+        self.utterance = utterance
+        self.turns = turns
+        self.turn_timeout = turn_timeout
+        self.latencies = []
+        self.failures = 0
+        self.sio = socketio.AsyncClient()
+        self.listening = asyncio.Event()
+        self.first_audio = asyncio.Event()
+        self.first_audio_at = 0.0
+        self.last_audio_at = 0.0
+
+        @self.sio.on("status")
+        async def on_status(data):
+            if data.get("message") == "Listening...":
+                self.listening.set()
+
+        @self.sio.on("audio_response")
+        async def on_audio(data):
+            self.last_audio_at = time.perf_counter()
+            if not self.first_audio.is_set():
+                self.first_audio_at = self.last_audio_at
+                self.first_audio.set()
+
+    async def stream(self, pcm):
+        chunk_bytes = CHUNK_SIZE * 2
+        started = time.perf_counter()
+        for i, offset in enumerate(range(0, len(pcm), chunk_bytes)):
+            await self.sio.emit("audio_chunk", pcm[offset:offset + chunk_bytes])
+            # Pace against the wall clock like a real microphone
+            await asyncio.sleep(max(0.0, started + (i + 1) * CHUNK_SECONDS - time.perf_counter()))
+
+    async def run(self):
+        silence = bytes(CHUNK_SIZE * 2)
+        await self.sio.connect(self.url, transports=["websocket"])
+        try:
+            await self.sio.emit("start_voice")
+            await asyncio.wait_for(self.listening.wait(), timeout=30)
+
+            for _ in range(self.turns):
+                self.first_audio.clear()
+                await self.stream(self.utterance)
+                speech_end = time.perf_counter()
+
+                # Keep sending silence, as an open mic would, until the reply starts
+                while not self.first_audio.is_set():
+                    if time.perf_counter() - speech_end > self.turn_timeout:
+                        self.failures += 1
+                        break
+                    await self.stream(silence)
+                else:
+                    self.latencies.append((self.first_audio_at - speech_end) * 1000)
+
+                # Wait out the rest of the reply before speaking again
+                while time.perf_counter() - self.last_audio_at < 0.5:
+                    await self.stream(silence)
+        except Exception:
+            self.failures += self.turns - len(self.latencies)
+        finally:
+            await self.sio.disconnect()
+
+
+async def run_step(url, sessions, utterance, turns, turn_timeout, server):
+    callers = [Caller(url, utterance, turns, turn_timeout) for _ in range(sessions)]
+    if server:
+        server.cpu_percent(None)
+        rss_before = server.memory_info().rss
+    started = time.perf_counter()
+    await asyncio.gather(*(caller.run() for caller in callers))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for caller in callers for latency in caller.latencies]
+    result = {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "failures": sum(caller.failures for caller in callers),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "elapsed": elapsed,
+    }
+    if server:
+        result["cpu_per_session"] = server.cpu_percent(None) / sessions
+        result["rss_mb_per_session"] = max(0, server.memory_info().rss - rss_before) / sessions / 2**20
+        result["rss_mb"] = server.memory_info().rss / 2**20
+    return result
+
+
+async def wait_for_server(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        client = socketio.AsyncClient()
+        try:
+            await client.connect(url, transports=["websocket"])
+            await client.disconnect()
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.5)
+
+
+def print_report(results, degrade_factor):
+    print(f"{'sessions':>8} {'turns':>6} {'fail':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'cpu%/sess':>10} {'MB/sess':>8}")
+    for r in results:
+        print(f"{r['sessions']:>8} {r['turns']:>6} {r['failures']:>5} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+              f"{r['p99']:>8.1f} {r.get('cpu_per_session', float('nan')):>10.1f} "
+              f"{r.get('rss_mb_per_session', float('nan')):>8.2f}")
+
+    baseline = results[0]["p95"]
+    for r in results[1:]:
+        if r["failures"] or r["p95"] > baseline * degrade_factor:
+            print(f"\nLatency degrades at {r['sessions']} sessions "
+                  f"(p95 {r['p95']:.1f} ms vs baseline {baseline:.1f} ms, {r['failures']} failed turns)")
+            break
+    else:
+        print(f"\nNo degradation past {degrade_factor}x baseline p95 up to {results[-1]['sessions']} sessions")
+
+
+async def main_async(args):
+    utterance = load_pcm(args.pcm) if args.pcm else synthesize_utterance()
+    server_proc = None
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server_proc = subprocess.Popen([
+            sys.executable, "-m", "benchmarks.serve",
+            "--port", str(args.port),
+            "--live-port", str(args.live_port),
+            "--response-delay-ms", str(args.response_delay_ms),
+            "--tool-call-every", str(args.tool_call_every),
+            "--db-latency-ms", str(args.db_latency_ms),
+        ])
+        server = psutil.Process(server_proc.pid)
+    elif args.server_pid:
+        server = psutil.Process(args.server_pid)
+
+    try:
+        await wait_for_server(url)
+        results = []
+        for sessions in args.sessions:
+            result = await run_step(url, sessions, utterance, args.turns, args.turn_timeout, server)
+            results.append(result)
+            print(f"{sessions} sessions: p95 {result['p95']:.1f} ms, {result['failures']} failed turns", flush=True)
+        print()
+        print_report(results, args.degrade_factor)
+    finally:
+        if server_proc:
+            server_proc.terminate()
+            server_proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="run against an already running server instead of starting benchmarks.serve")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for CPU and memory sampling")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--live-port", type=int, default=8765)
+    parser.add_argument("--sessions", type=lambda s: [int(n) for n in s.split(",")], default=[1, 5, 10, 20])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--turn-timeout", type=float, default=15.0)
+    parser.add_argument("--pcm", help="16 kHz mono PCM16 utterance (.wav or raw .pcm)")
+    parser.add_argument("--response-delay-ms", type=int, default=300)
+    parser.add_argument("--tool-call-every", type=int, default=0)
+    parser.add_argument("--db-latency-ms", type=int, default=40)
+    parser.add_argument("--degrade-factor", type=float, default=2.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
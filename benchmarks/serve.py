@@ -0,0 +1,59 @@
+"""Run app.py against the fake Live API and the fake Supabase backend.
+
+    python -m benchmarks.serve --port 5000 --live-port 8765 --db-latency-ms 40
+"""
+
+import argparse
+import asyncio
+import os
+import threading
+
+from benchmarks.fake_live_server import FakeLiveServer, self_signed_cert, server_ssl_context
+from benchmarks.fake_supabase import FakeSupabaseFoodOrderingTools
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--live-port", type=int, default=8765)
+    parser.add_argument("--response-delay-ms", type=int, default=300)
+    parser.add_argument("--reply-ms", type=int, default=1500)
+    parser.add_argument("--tool-call-every", type=int, default=0)
+    parser.add_argument("--db-latency-ms", type=int, default=40)
+    args = parser.parse_args()
+
+    live_server = FakeLiveServer(
+        response_delay_ms=args.response_delay_ms,
+        reply_ms=args.reply_ms,
+        tool_call_every=args.tool_call_every,
+    )
+    cert_path, key_path = self_signed_cert(args.host)
+    threading.Thread(
+        target=lambda: asyncio.run(
+            live_server.serve(args.host, args.live_port, server_ssl_context(cert_path, key_path))
+        ),
+        name="fake-live-api",
+        daemon=True,
+    ).start()
+
+    # Read by app.py when it builds its Live API client. The client always dials wss://,
+    # and builds its TLS context from SSL_CERT_FILE, so this trusts only the fake's certificate
+    os.environ["LIVE_API_BASE_URL"] = f"https://{args.host}:{args.live_port}"
+    os.environ["SSL_CERT_FILE"] = cert_path
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+    import app as voice_app
+    from order_journal import OrderJournal
+    from sql_utils import AsyncSupabaseFoodOrderingTools
+
+    voice_app._db_tools = AsyncSupabaseFoodOrderingTools(
+        FakeSupabaseFoodOrderingTools(args.db_latency_ms, warm_menu_cache=True, journal=OrderJournal(":memory:"))
+    )
+    voice_app.start_worker()
+    voice_app.background_loop.submit(voice_app._db_tools.run_journal_flusher())
+    voice_app.socketio.run(voice_app.app, host=args.host, port=args.port, allow_unsafe_werkzeug=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,7 @@ You are a friendly, helpful, and highly accurate AI Food Ordering Agent. Your pr
 
 1. **Menu and Pricing:** Always reference the `menu` table to answer questions about available items, categories, and prices.
 
-2. **Order Placement:** When a user is ready to order, you must construct *two* related objects—one for the **order** and one for the **delivery**. This requires obtaining the items/quantities, the delivery address from the user.
-   * **Order Object:** Construct using the **`items`** (dictionary mapping item_id to quantity), **`total_amount`** (calculated automatically using `menu.price`), and `special_requests`.
-   * **Delivery Object:** Construct using the **`order_id`** (from the newly placed order), **`delivery_address`** (required from the user), and setting **`status`** to `'PREPARING'` as the initial state.
+2. **Order Placement:** When a user is ready to order, gather the items/quantities, the delivery address and the phone number, then call `place_order` once. It creates both the **order** (with **`total_amount`** calculated automatically from `menu.price`) and its **delivery** (status `'PREPARING'`).
 
 3. **Order Tracking:** Use the `deliveries` table to provide status updates, delivery address, and courier details.
 
@@ -47,8 +45,8 @@ This is a streamlined schema with three tables: `menu`, `orders`, and `deliverie
 ## Available Functions:
 
 1. **get_menu_items(category=None):** Fetch available menu items, optionally filtered by category.
-2. **create_order(items, special_requests=None):** Create a new order and return the order_id.
-3. **create_delivery(order_id, delivery_address):** Create delivery record for an order.
+2. **resolve_menu_item(utterance, limit=3):** Match how the user described an item (e.g. "a large coke") to menu items, best match first. Prefer this over fetching the whole menu when you only need an item_id.
+3. **place_order(items, delivery_address, customer_phone_number, special_requests=None):** Place an order together with its delivery and return the order_id. Pass `items` as a list of `{"item_id": ..., "quantity": ...}` entries.
 4. **get_order_status(phone_number):** Get order status and details by customer phone number.
 
 ---
@@ -57,9 +55,9 @@ This is a streamlined schema with three tables: `menu`, `orders`, and `deliverie
 
 - Be conversational and friendly
 - Always confirm order details before placing
-- Ask for delivery address when placing orders
+- Ask for delivery address and phone number when placing orders
 - Provide clear pricing information
-- Help users track their existing orders
+- Help users track their existing orders by phone number; there's no need to read order IDs out
 - Handle menu inquiries professionally
 """
 
@@ -72,4 +70,105 @@ VOICE_CONFIG = {
 DB_CONFIG = {
     "connection_timeout": 30,
     "retry_attempts": 3,
-}
\ No newline at end of file
+    "max_workers": 8,
+    "menu_cache_ttl": 300,
+    # Order status lookups are served from a local index; entries expire only without a change feed
+    "order_status_ttl": 30,
+    "order_status_max_per_phone": 5,
+    # Order writes go to a local journal first and are committed to Supabase in the background
+    "journal_path": "orders_journal.db",
+    "journal_batch_size": 50,
+    # Wait this long after a write so concurrent orders share one insert
+    "journal_flush_delay_ms": 50,
+    "journal_max_backoff": 30,
+    # An entry that fails this many commits is given up, and a given-up delivery removes its order
+    "journal_max_attempts": 8,
+}
+
+AUDIO_CONFIG = {
+    # "browser" streams PCM over Socket.IO, "server" uses the host's PyAudio devices
+    "io_mode": "browser",
+    # Reply audio buffered before playback starts, trading latency for smoothness
+    "jitter_buffer_ms": 60,
+    "playback_buffer_ms": 2000,
+    "playback_frames_per_buffer": 256,
+    # Voice activity detection before send: "energy", "webrtc" (needs webrtcvad) or None
+    "vad": "energy",
+    "vad_threshold_db": -45.0,
+    "vad_aggressiveness": 2,
+    "vad_hangover_ms": 300,
+    "vad_preroll_ms": 200,
+    # Codecs offered to browser and telephony clients, best first ("opus" needs opuslib)
+    "codec_preference": ["opus", "mulaw", "pcm16"],
+    # Mic frames are coalesced into sends of about this much audio. A mic chunk is 1024
+    # samples (64 ms), so this must be larger than that for any coalescing to happen
+    "send_batch_ms": 128,
+    # Queues are capped by milliseconds of audio. When full, the policy is one of
+    # "block", "drop_oldest", "drop_newest" or "coalesce"
+    "send_queue_policy": "drop_oldest",
+    "send_queue_max_ms": 320,
+    # The receive loop never waits on its queue, so an interruption is acted on at once
+    # even while a long reply is queued; size it for the longest reply
+    "receive_queue_policy": "drop_newest",
+    "receive_queue_max_ms": 60000,
+}
+
+SESSION_CONFIG = {
+    "max_concurrent_sessions": 50,
+    # Pre-connected Live API sessions kept ready for new callers (0 disables)
+    "warm_pool_size": 2,
+    "warm_session_max_idle": 300,
+    # Warm sessions are replaced once this old, and checked for a dropped socket this often
+    "warm_session_refresh_after": 240,
+    "warm_session_check_interval": 15,
+    "resume_attempts": 3,
+    # Once the context passes trigger_tokens the server drops the oldest turns down to target_tokens
+    "context_trigger_tokens": 25600,
+    "context_target_tokens": 12800,
+    # Append the menu snapshot to the shared system prompt
+    "menu_in_prompt": True,
+    # Order status fetched, and a menu reload started, when a call starts are used to its tool calls for this long
+    "prefetch_max_age": 60,
+}
+
+SERVER_CONFIG = {
+    # Socket.IO message queue shared by the workers of run.py, e.g. "redis://localhost:6379/0".
+    # None keeps emits in-process; SOCKETIO_MESSAGE_QUEUE overrides it
+    "message_queue": None,
+    # Concurrent connections per worker
+    "threads": 100,
+}
+
+TRANSCRIPT_CONFIG = {
+    # SQLite file the conversation turns are written to
+    "path": "transcripts.db",
+    # A batch is written once this many turns are buffered or this long after the first one
+    "flush_turns": 20,
+    "flush_interval_ms": 1000,
+    "page_size": 50,
+}
+
+LOGGING_CONFIG = {
+    "level": "INFO",
+    # "json" for one structured object per line, "text" for reading in a terminal
+    "format": "json",
+    # Records waiting for the writer thread; beyond this they are dropped rather than blocking
+    "queue_size": 10000,
+    # Share of per-chunk events in the audio loops that get a log line
+    "hot_loop_sample_rate": 0.01,
+}
+
+SUPERVISOR_CONFIG = {
+    # A pipeline task that fails is restarted up to max_restarts times per window_seconds,
+    # after which the session is ended
+    "max_restarts": 3,
+    "window_seconds": 60,
+    "restart_delay": 0.5,
+}
+
+METRICS_CONFIG = {
+    # Seconds between metrics pushes to each caller's UI
+    "push_interval": 2.0,
+    # Seconds /metrics waits for the event loop to build its snapshot
+    "scrape_timeout": 5.0,
+}
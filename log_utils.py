@@ -0,0 +1,124 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+
+from config import LOGGING_CONFIG
+
+# Attributes every LogRecord has; anything else on a record came in through extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with the extra fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = ' '.join(f'{key}={value}' for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        return f'{line} {fields}' if fields else line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: when the queue is full the record is dropped and counted"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Skip QueueHandler's eager formatting; the listener thread formats
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SessionLogger(logging.LoggerAdapter):
+    """Adds the session id, and any other fixed fields, to every record"""
+
+    def process(self, msg, kwargs):
+        kwargs['extra'] = {**self.extra, **kwargs.get('extra', {})}
+        return msg, kwargs
+
+
+class LogSampler:
+    """Lets one in every `1 / rate` events through, for log lines inside per-chunk loops.
+
+    The first event always passes. A passing event reports how many were
+    skipped since the last one, so totals can still be read off the log.
+    """
+
+    def __init__(self, rate=LOGGING_CONFIG["hot_loop_sample_rate"]):
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self._seen = 0
+        self._skipped = 0
+        self._lock = threading.Lock()
+
+    def sample(self):
+        """None to skip this event, else the number of events skipped before it"""
+        if not self.every:
+            return None
+        with self._lock:
+            passed = self._seen % self.every == 0
+            self._seen += 1
+            if not passed:
+                self._skipped += 1
+                return None
+            skipped, self._skipped = self._skipped, 0
+        return skipped
+
+
+_listener = None
+_handler = None
+
+
+def configure_logging(level=LOGGING_CONFIG["level"], fmt=LOGGING_CONFIG["format"],
+                      queue_size=LOGGING_CONFIG["queue_size"]):
+    """Route the root logger through a bounded queue to a writer thread.
+
+    Callers only ever enqueue, so a slow or blocked stdout never stalls the
+    event loop. Returns the QueueListener; stop() it at exit to flush.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return _listener
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+    log_queue = queue.Queue(queue_size)
+    _handler = DroppingQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def dropped_records():
+    """Log records discarded because the queue was full"""
+    return _handler.dropped if _handler else 0
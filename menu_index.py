@@ -0,0 +1,193 @@
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+# Field weights: a hit on the name counts most, the category least
+FIELDS = {'name': 1.0, 'description': 0.5, 'category': 0.4}
+PHONETIC_WEIGHT = 0.5
+EMBEDDING_WEIGHT = 1.0
+
+STOPWORDS = {
+    'a', 'an', 'the', 'some', 'any', 'of', 'and', 'with', 'for', 'please', 'i', 'id', 'want', 'would',
+    'like', 'get', 'can', 'have', 'me', 'my', 'one', 'thing', 'that', 'this', 'those', 'uh', 'um',
+}
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys('bfpv', '1'), **dict.fromkeys('cgjkqsxz', '2'), **dict.fromkeys('dt', '3'),
+    'l': '4', **dict.fromkeys('mn', '5'), 'r': '6',
+}
+
+
+def tokenize(text) -> List[str]:
+    words = re.findall(r'[a-z0-9]+', str(text or '').lower().replace("'", ''))
+    return [word for word in words if word not in STOPWORDS]
+
+
+def trigrams(words) -> Set[str]:
+    grams = set()
+    for word in words:
+        padded = f' {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def soundex(word) -> str:
+    if word.isdigit():
+        return word
+    code = word[0]
+    previous = _SOUNDEX_CODES.get(word[0], '')
+    for ch in word[1:]:
+        digit = _SOUNDEX_CODES.get(ch, '')
+        if digit and digit != previous:
+            code += digit
+        if ch not in 'hw':
+            previous = digit
+    return (code + '000')[:4]
+
+
+def _signature(item) -> Tuple:
+    return tuple(item.get(field) for field in (*FIELDS, 'price'))
+
+
+class MenuIndex:
+    """Trigram and phonetic index over menu items for resolving spoken item names.
+
+    Each item's name, description and category are indexed by character
+    trigrams (which tolerate partial words and transcription slips) and by
+    Soundex codes (so "coke" finds "Coca-Cola"). An optional embed callable
+    adds cosine similarity on top. sync() only re-indexes rows that changed.
+    """
+
+    def __init__(self, embed: Optional[Callable[[List[str]], Sequence[Sequence[float]]]] = None,
+                 min_score: float = 0.15):
+        self.embed = embed
+        self.min_score = min_score
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._signatures: Dict[str, Tuple] = {}
+        self._grams: Dict[str, Set[Tuple[str, str]]] = {}
+        self._phones: Dict[str, Set[Tuple[str, str]]] = {}
+        self._sizes: Dict[Tuple[str, str], int] = {}
+        self._vectors: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def sync(self, items: List[Dict[str, Any]]) -> None:
+        """Bring the index in line with a full menu snapshot, touching only changed rows"""
+        current = {str(item['item_id']): item for item in items}
+        changed = [item for item_id, item in current.items() if self._signatures.get(item_id) != _signature(item)]
+        vectors = self._embed_items(changed)
+        with self._lock:
+            for item_id in set(self._items) - set(current):
+                self._remove(item_id)
+            for item in changed:
+                self._upsert(item, vectors.get(str(item['item_id'])))
+
+    def upsert(self, item: Dict[str, Any]) -> None:
+        vectors = self._embed_items([item])
+        with self._lock:
+            self._upsert(item, vectors.get(str(item['item_id'])))
+
+    def remove(self, item_id) -> None:
+        with self._lock:
+            self._remove(str(item_id))
+
+    def _embed_items(self, items) -> Dict[str, Any]:
+        if not self.embed or not items:
+            return {}
+        import numpy as np
+
+        texts = [' '.join(str(item.get(field) or '') for field in FIELDS) for item in items]
+        vectors = {}
+        for item, vector in zip(items, self.embed(texts)):
+            vector = np.asarray(vector, dtype=np.float32)
+            vectors[str(item['item_id'])] = vector / (np.linalg.norm(vector) or 1.0)
+        return vectors
+
+    def _upsert(self, item, vector) -> None:
+        item_id = str(item['item_id'])
+        self._remove(item_id)
+        self._items[item_id] = item
+        self._signatures[item_id] = _signature(item)
+        if vector is not None:
+            self._vectors[item_id] = vector
+        for field in FIELDS:
+            words = tokenize(item.get(field))
+            grams = trigrams(words)
+            self._sizes[(item_id, field)] = len(grams)
+            for gram in grams:
+                self._grams.setdefault(gram, set()).add((item_id, field))
+            for code in {soundex(word) for word in words}:
+                self._phones.setdefault(code, set()).add((item_id, field))
+
+    def _remove(self, item_id) -> None:
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return
+        self._signatures.pop(item_id, None)
+        self._vectors.pop(item_id, None)
+        for field in FIELDS:
+            words = tokenize(item.get(field))
+            self._sizes.pop((item_id, field), None)
+            for gram in trigrams(words):
+                self._discard(self._grams, gram, (item_id, field))
+            for code in {soundex(word) for word in words}:
+                self._discard(self._phones, code, (item_id, field))
+
+    @staticmethod
+    def _discard(postings, key, entry) -> None:
+        entries = postings.get(key)
+        if entries is not None:
+            entries.discard(entry)
+            if not entries:
+                del postings[key]
+
+    def search(self, utterance: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Rank menu items against what the caller said"""
+        words = tokenize(utterance)
+        if not words:
+            return []
+        grams = trigrams(words)
+        codes = {soundex(word) for word in words}
+        query_vector = None
+        if self.embed and self._vectors:
+            import numpy as np
+
+            query_vector = np.asarray(self.embed([utterance])[0], dtype=np.float32)
+            query_vector /= np.linalg.norm(query_vector) or 1.0
+
+        with self._lock:
+            common: Dict[Tuple[str, str], int] = {}
+            for gram in grams:
+                for entry in self._grams.get(gram, ()):
+                    common[entry] = common.get(entry, 0) + 1
+            phone_hits: Dict[Tuple[str, str], int] = {}
+            for code in codes:
+                for entry in self._phones.get(code, ()):
+                    phone_hits[entry] = phone_hits.get(entry, 0) + 1
+
+            scores: Dict[str, float] = {}
+            for (item_id, field), count in common.items():
+                # Dice coefficient between the query's trigrams and the field's
+                dice = 2 * count / (len(grams) + self._sizes[(item_id, field)])
+                scores[item_id] = scores.get(item_id, 0.0) + FIELDS[field] * dice
+            for (item_id, field), count in phone_hits.items():
+                scores[item_id] = scores.get(item_id, 0.0) + FIELDS[field] * PHONETIC_WEIGHT * count / len(codes)
+            if query_vector is not None:
+                for item_id, vector in self._vectors.items():
+                    scores[item_id] = scores.get(item_id, 0.0) + EMBEDDING_WEIGHT * float(vector @ query_vector)
+
+            ranked = sorted(
+                (item for item in scores.items() if item[1] >= self.min_score), key=lambda item: item[1], reverse=True
+            )[:limit]
+            return [
+                {
+                    'item_id': self._items[item_id]['item_id'],
+                    'name': self._items[item_id].get('name'),
+                    'category': self._items[item_id].get('category'),
+                    'price': self._items[item_id].get('price'),
+                    'score': round(score, 3),
+                }
+                for item_id, score in ranked
+            ]
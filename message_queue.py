@@ -0,0 +1,42 @@
+import queue
+import threading
+
+import socketio
+
+
+class InMemoryManager(socketio.PubSubManager):
+    """In-process stand-in for RedisManager.
+
+    Every manager created in this process shares one fan-out, so emits
+    behave as they would across workers on a real queue. Meant for tests
+    and single-process runs only; it cannot reach other processes.
+    """
+
+    name = 'memory'
+    _inboxes = []
+    _inboxes_lock = threading.Lock()
+
+    def __init__(self, channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._inbox = queue.Queue()
+        with self._inboxes_lock:
+            self._inboxes.append(self._inbox)
+
+    def _publish(self, data):
+        with self._inboxes_lock:
+            inboxes = list(self._inboxes)
+        for inbox in inboxes:
+            inbox.put(data)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+def socketio_queue_options(url):
+    """SocketIO keyword arguments for a message queue URL (redis://... or memory://)"""
+    if not url:
+        return {}
+    if url == 'memory://':
+        return {'client_manager': InMemoryManager()}
+    return {'message_queue': url}
@@ -0,0 +1,170 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Cumulative latency histogram in milliseconds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.last = None
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.last = value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'avg': round(self.sum / self.count, 1) if self.count else None,
+            'last': round(self.last, 1) if self.last is not None else None,
+        }
+
+
+class SessionMetrics:
+    """Latency and pipeline health for one voice session"""
+
+    HISTOGRAMS = ('queue_wait_ms', 'first_response_ms', 'first_audio_ms')
+
+    def __init__(self, sid):
+        self.sid = sid
+        self.histograms = {name: Histogram() for name in self.HISTOGRAMS}
+        self.tool_calls: Dict[str, Histogram] = {}
+        self.gauges: Dict[str, float] = {}
+        self._speech_ended_at: Optional[float] = None
+        self._awaiting_response = False
+        self._awaiting_audio = False
+
+    def observe(self, name, value):
+        self.histograms[name].observe(value)
+
+    def observe_tool_call(self, name, duration_ms):
+        self.tool_calls.setdefault(name, Histogram()).observe(duration_ms)
+
+    def set_gauge(self, name, value):
+        self.gauges[name] = value
+
+    def record_usage(self, usage):
+        """Accumulate a Live API usage_metadata report"""
+        # Prompt tokens of the latest turn: how full the context window is right now
+        self.gauges['context_tokens'] = usage.prompt_token_count or 0
+        for name, value in (
+            ('prompt_tokens_total', usage.prompt_token_count),
+            ('response_tokens_total', usage.response_token_count),
+            ('cached_tokens_total', usage.cached_content_token_count),
+        ):
+            self.gauges[name] = self.gauges.get(name, 0) + (value or 0)
+
+    def record_prefetch(self, hit, saved_ms=0.0):
+        """Count a tool lookup against the session's prefetch cache"""
+        name = 'prefetch_hits' if hit else 'prefetch_misses'
+        self.gauges[name] = self.gauges.get(name, 0) + 1
+        self.gauges['prefetch_saved_ms_total'] = round(self.gauges.get('prefetch_saved_ms_total', 0) + saved_ms, 1)
+        hits = self.gauges.get('prefetch_hits', 0)
+        self.gauges['prefetch_hit_rate'] = round(hits / (hits + self.gauges.get('prefetch_misses', 0)), 3)
+
+    def mark_speech_end(self):
+        """The caller stopped talking; start the response clocks"""
+        self._speech_ended_at = time.perf_counter()
+        self._awaiting_response = True
+        self._awaiting_audio = True
+
+    def mark_response(self):
+        """Any server message arrived for the current turn"""
+        if self._awaiting_response:
+            self._awaiting_response = False
+            self.observe('first_response_ms', (time.perf_counter() - self._speech_ended_at) * 1000)
+
+    def mark_audio_played(self, delay_ms=0.0):
+        """Reply audio was handed to the output for the current turn, and starts playing delay_ms later"""
+        if self._awaiting_audio:
+            self._awaiting_audio = False
+            self.observe('first_audio_ms', (time.perf_counter() - self._speech_ended_at) * 1000 + delay_ms)
+
+    def snapshot(self):
+        return {
+            **{name: histogram.snapshot() for name, histogram in self.histograms.items()},
+            'tool_calls': {name: histogram.snapshot() for name, histogram in self.tool_calls.items()},
+            **self.gauges,
+        }
+
+
+class StartupTimings:
+    """How long each part of boot, and each lazily created client, took"""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (time.perf_counter() - started) * 1000
+
+    def record(self, name, ms):
+        self.phases[name] = ms
+
+
+startup_timings = StartupTimings()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _render_histogram(lines, name, histogram, **labels):
+    for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {count}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {histogram.count}')
+    lines.append(f'{name}_sum{_labels(**labels)} {histogram.sum}')
+    lines.append(f'{name}_count{_labels(**labels)} {histogram.count}')
+
+
+def render_prometheus(all_metrics: Iterable[SessionMetrics]):
+    """Render session metrics in the Prometheus text exposition format"""
+    all_metrics = list(all_metrics)
+    lines = [
+        '# TYPE voicebot_active_sessions gauge',
+        f'voicebot_active_sessions {len(all_metrics)}',
+    ]
+
+    for name in SessionMetrics.HISTOGRAMS:
+        metric = f'voicebot_{name}'
+        lines.append(f'# TYPE {metric} histogram')
+        for metrics in all_metrics:
+            _render_histogram(lines, metric, metrics.histograms[name], session=metrics.sid)
+
+    lines.append('# TYPE voicebot_tool_call_ms histogram')
+    for metrics in all_metrics:
+        for tool, histogram in metrics.tool_calls.items():
+            _render_histogram(lines, 'voicebot_tool_call_ms', histogram, session=metrics.sid, tool=tool)
+
+    lines.append('# TYPE voicebot_startup_ms gauge')
+    for phase, ms in startup_timings.phases.items():
+        lines.append(f'voicebot_startup_ms{_labels(phase=phase)} {round(ms, 1)}')
+
+    gauge_names = sorted({name for metrics in all_metrics for name in metrics.gauges})
+    for name in gauge_names:
+        metric = f'voicebot_{name}'
+        lines.append(f'# TYPE {metric} gauge')
+        for metrics in all_metrics:
+            if name in metrics.gauges:
+                lines.append(f'{metric}{_labels(session=metrics.sid)} {metrics.gauges[name]}')
+
+    return '\n'.join(lines) + '\n'
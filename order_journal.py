@@ -0,0 +1,113 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    detail TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcomes_key ON outcomes (idempotency_key, outcome);
+"""
+
+# Outcomes that take an entry out of the pending set; 'error' rows only count attempts
+FINAL_OUTCOMES = ('committed', 'failed')
+
+
+def idempotency_key(*parts) -> str:
+    """Stable key for one intended write, from its scope and canonicalized arguments"""
+    canonical = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def order_id_for(key: str) -> int:
+    """Order id derived from the idempotency key, so a replayed insert hits the same primary key.
+
+    Kept below 2**53 so it survives JSON and JavaScript untouched.
+    """
+    return int(key[:16], 16) % (2 ** 53 - 1) + 1
+
+
+class OrderJournal:
+    """Append-only SQLite journal of intended writes to Supabase.
+
+    Each write is journaled once under its idempotency key; appending the
+    same key again returns the original payload instead of a second entry.
+    Commits, retries and give-ups are recorded as outcome rows, so nothing
+    is ever updated in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._floor = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def append(self, key: str, kind: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Journal a write; returns (payload as journaled, whether this call added it)"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO journal (idempotency_key, kind, payload, created_at) VALUES (?, ?, ?, ?)',
+                    (key, kind, json.dumps(payload, default=str), time.time()),
+                )
+            if cursor.rowcount:
+                return payload, True
+            row = conn.execute('SELECT payload FROM journal WHERE idempotency_key = ?', (key,)).fetchone()
+            return json.loads(row[0]), False
+
+    def pending(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """The oldest entries without a final outcome, in journal order"""
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT j.seq, j.idempotency_key, j.kind, j.payload, '
+                "(SELECT COUNT(*) FROM outcomes o WHERE o.idempotency_key = j.idempotency_key AND o.outcome = 'error') "
+                'FROM journal j WHERE j.seq > ? AND NOT EXISTS ('
+                '    SELECT 1 FROM outcomes o WHERE o.idempotency_key = j.idempotency_key AND o.outcome IN (?, ?)'
+                ') ORDER BY j.seq LIMIT ?',
+                (self._floor, *FINAL_OUTCOMES, limit),
+            ).fetchall()
+            if rows:
+                # Everything before the oldest pending entry is settled; skip it from now on
+                self._floor = max(self._floor, rows[0][0] - 1)
+        return [
+            {'seq': seq, 'key': key, 'kind': kind, 'payload': json.loads(payload), 'attempts': attempts}
+            for seq, key, kind, payload, attempts in rows
+        ]
+
+    def record(self, keys: Iterable[str], outcome: str, detail: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO outcomes (idempotency_key, outcome, detail, created_at) VALUES (?, ?, ?, ?)',
+                    [(key, outcome, detail, now) for key in keys],
+                )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
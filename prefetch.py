@@ -0,0 +1,73 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from config import SESSION_CONFIG
+from metrics import SessionMetrics
+
+
+class PrefetchCache:
+    """Tool results fetched speculatively when a session starts.
+
+    Each entry is a task, so a tool call that arrives while its prefetch
+    is still running waits for it instead of issuing a second query.
+    Entries older than max_age, failed prefetches and anything never
+    prefetched count as misses and fall through to the tools. Every
+    lookup is recorded in the session metrics together with the query
+    time it saved.
+    """
+
+    def __init__(self, metrics: Optional[SessionMetrics] = None,
+                 max_age: float = SESSION_CONFIG["prefetch_max_age"]):
+        self.metrics = metrics
+        self.max_age = max_age
+        self._entries: Dict[Hashable, Dict[str, Any]] = {}
+
+    def start(self, key: Hashable, coro: Awaitable) -> None:
+        """Begin fetching key in the background; must run on the event loop"""
+        self.invalidate(key)
+        entry = {'task': asyncio.ensure_future(coro), 'started': time.perf_counter(), 'finished': None}
+        entry['task'].add_done_callback(lambda _: entry.update(finished=time.perf_counter()))
+        self._entries[key] = entry
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    async def get(self, key: Hashable) -> Optional[Any]:
+        """The prefetched result for key, or None on a miss"""
+        entry = self._entries.get(key)
+        if entry is None or time.perf_counter() - entry['started'] > self.max_age:
+            return self._miss(key)
+        waited_from = time.perf_counter()
+        try:
+            # Shielded so a cancelled tool call doesn't cancel the prefetch for later ones
+            result = await asyncio.shield(entry['task'])
+        except asyncio.CancelledError:
+            if not entry['task'].cancelled():
+                raise
+            return self._miss(key)
+        except Exception:
+            return self._miss(key)
+        if result is None:
+            return self._miss(key)
+        waited = time.perf_counter() - waited_from
+        saved_ms = ((entry['finished'] or time.perf_counter()) - entry['started'] - waited) * 1000
+        if self.metrics:
+            self.metrics.record_prefetch(True, max(0.0, saved_ms))
+        return result
+
+    def _miss(self, key: Hashable) -> None:
+        self.invalidate(key)
+        if self.metrics:
+            self.metrics.record_prefetch(False)
+        return None
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop an entry whose data has changed; safe to call from any thread"""
+        entry = self._entries.pop(key, None)
+        if entry is not None and not entry['task'].done():
+            entry['task'].get_loop().call_soon_threadsafe(entry['task'].cancel)
+
+    def close(self) -> None:
+        for key in list(self._entries):
+            self.invalidate(key)
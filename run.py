@@ -0,0 +1,80 @@
+"""Launch the voice bot.
+
+    python run.py                  # one process, for development
+    python run.py --workers 4      # gunicorn workers sharing a Socket.IO message queue
+
+Each worker is a separate process with its own Live API sessions. The page
+connects over the websocket transport only, so a caller's whole
+conversation stays on the worker that accepted its socket, and there are no
+polling requests that would need sticky routing. Emits go through the
+message queue (Redis, or memory:// for a single process), so they reach
+the caller no matter which worker sends them.
+"""
+
+import argparse
+import os
+
+from config import SERVER_CONFIG
+
+
+def run_development(args):
+    import app as voice_app
+
+    voice_app.start_worker()
+    voice_app.socketio.run(voice_app.app, host=args.host, port=args.port, allow_unsafe_werkzeug=True)
+
+
+def run_workers(args):
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        # Threaded workers: every session runs on the worker's own asyncio thread
+        "worker_class": "gthread",
+        "threads": args.threads,
+        "preload_app": False,
+    }
+
+    class VoiceBotApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Imported after the fork so each worker gets its own clients, loop thread and session pool
+            import app as voice_app
+
+            voice_app.start_worker()
+            return voice_app.app
+
+    VoiceBotApplication().run()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes; more than 1 uses gunicorn")
+    parser.add_argument("--threads", type=int, default=SERVER_CONFIG["threads"],
+                        help="connections each worker can hold")
+    parser.add_argument("--message-queue", default=os.getenv("SOCKETIO_MESSAGE_QUEUE", SERVER_CONFIG["message_queue"]),
+                        help="redis://host:port/db, or memory:// for a single process")
+    args = parser.parse_args()
+
+    if args.workers > 1 and not args.message_queue:
+        parser.error("--workers needs a shared --message-queue such as redis://localhost:6379/0")
+    if args.workers > 1 and args.message_queue == "memory://":
+        parser.error("memory:// only works within one process; use Redis with --workers")
+    if args.message_queue:
+        # Read by app.py when it builds the SocketIO server
+        os.environ["SOCKETIO_MESSAGE_QUEUE"] = args.message_queue
+
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        run_development(args)
+
+
+if __name__ == "__main__":
+    main()
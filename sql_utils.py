@@ -1,69 +1,400 @@
 import os
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from typing import Optional, Dict, Any, List
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, Callable
+import asyncio
+import functools
 import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from config import DB_CONFIG
+from menu_index import MenuIndex
+from order_journal import OrderJournal, order_id_for
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+class JournalConflict(Exception):
+    """Supabase already holds a different row under a journaled entry's order_id"""
+
+    def __init__(self, table: str, order_id: int):
+        super().__init__(f"{table} already has a different row for order {order_id}")
+        self.table = table
+        self.order_id = order_id
+
+
+class MenuCache:
+    """In-process snapshot of the available menu, indexed by category and item_id."""
+
+    def __init__(self, loader: Callable[[], List[Dict[str, Any]]], ttl: float = DB_CONFIG["menu_cache_ttl"],
+                 on_refresh: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        self._loader = loader
+        self.ttl = ttl
+        self.on_refresh = on_refresh
+        self._items: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_category: Dict[str, List[Dict[str, Any]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def refresh(self) -> None:
+        items = self._loader()
+        by_id = {}
+        by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for item in items:
+            by_id[str(item['item_id'])] = item
+            by_category.setdefault(item.get('category'), []).append(item)
+        with self._lock:
+            self._items = items
+            self._by_id = by_id
+            self._by_category = by_category
+            self._loaded_at = time.monotonic()
+        if self.on_refresh:
+            self.on_refresh(items)
+
+    def warm(self) -> None:
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.error('Error warming menu cache', extra={'error': repr(e)})
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_fresh(self) -> None:
+        if not self.is_stale():
+            return
+        try:
+            self.refresh()
+        except Exception as e:
+            # Keep serving the last snapshot if there is one
+            if not self._items:
+                raise
+            logger.warning('Error refreshing menu cache, serving stale menu', extra={'error': repr(e)})
+
+    def get_items(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        self._ensure_fresh()
+        if category:
+            return list(self._by_category.get(category, []))
+        return list(self._items)
+
+    def get_item(self, item_id) -> Optional[Dict[str, Any]]:
+        self._ensure_fresh()
+        return self._by_id.get(str(item_id))
+
+
+def normalize_phone(phone_number) -> str:
+    if isinstance(phone_number, float) and phone_number.is_integer():
+        phone_number = int(phone_number)
+    return ''.join(ch for ch in str(phone_number) if ch.isdigit())
+
+
+def _phone_column(phone_number) -> str:
+    """A phone number as written to deliveries.customer_phone_number, which is NUMERIC"""
+    phone = normalize_phone(phone_number)
+    if not phone:
+        raise ValueError(f"Invalid phone number: {phone_number!r}")
+    return phone
+
+
+def _same_row(table: str, existing: Dict[str, Any], row: Dict[str, Any]) -> bool:
+    """Whether an existing row is this journaled row, judged by the columns that don't change after insert"""
+    if table == 'orders':
+        return (existing.get('items') == row['items']
+                and float(existing.get('total_amount') or 0) == float(row['total_amount'])
+                and existing.get('special_requests') == row['special_requests'])
+    return (existing.get('delivery_address') == row['delivery_address']
+            and normalize_phone(existing.get('customer_phone_number', ''))
+            == normalize_phone(row['customer_phone_number']))
+
+
+class OrderStatusIndex:
+    """Phone number -> recent deliveries (with their orders), kept current by a change feed.
+
+    While a change feed is attached (live is True) entries never go stale and
+    lookups are served locally; otherwise they expire after ttl seconds.
+
+    Change feed rows don't carry the orders join. A new delivery gets its
+    order from remember_order when this process placed it; otherwise the
+    phone's entry is dropped so the next lookup reloads it joined.
+    """
+
+    def __init__(self, loader: Callable[[str], List[Dict[str, Any]]],
+                 ttl: float = DB_CONFIG["order_status_ttl"],
+                 max_per_phone: int = DB_CONFIG["order_status_max_per_phone"],
+                 max_remembered: int = 1000):
+        self._loader = loader
+        self.ttl = ttl
+        self.max_per_phone = max_per_phone
+        self.max_remembered = max_remembered
+        self.live = False
+        self._by_phone: Dict[str, List[Dict[str, Any]]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._orders: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._listeners: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self._lock = threading.Lock()
+
+    def _store(self, phone: str, deliveries: List[Dict[str, Any]]) -> None:
+        deliveries.sort(key=lambda delivery: str(delivery.get('order_date') or ''), reverse=True)
+        self._by_phone[phone] = deliveries[:self.max_per_phone]
+
+    def get(self, phone_number) -> List[Dict[str, Any]]:
+        phone = normalize_phone(phone_number)
+        with self._lock:
+            loaded_at = self._loaded_at.get(phone)
+            if loaded_at is not None and (self.live or time.monotonic() - loaded_at <= self.ttl):
+                return [dict(delivery) for delivery in self._by_phone.get(phone, [])]
+
+        deliveries = self._loader(phone_number)
+        with self._lock:
+            self._store(phone, [dict(delivery) for delivery in deliveries])
+            self._loaded_at[phone] = time.monotonic()
+            return [dict(delivery) for delivery in self._by_phone[phone]]
+
+    def set_live(self, live: bool) -> None:
+        """Mark the change feed attached or detached"""
+        with self._lock:
+            if live and not self.live:
+                # Changes made while no feed was attached were missed, so reload on next use
+                self._by_phone.clear()
+                self._loaded_at.clear()
+            self.live = live
+
+    def remember_order(self, order: Dict[str, Any]) -> None:
+        """Keep an order this process placed, to join onto its delivery when that arrives"""
+        with self._lock:
+            self._orders[str(order['order_id'])] = dict(order)
+            while len(self._orders) > self.max_remembered:
+                self._orders.popitem(last=False)
+
+    def apply_change(self, event_type: str, record: Dict[str, Any],
+                     old_record: Optional[Dict[str, Any]] = None) -> None:
+        """Apply one deliveries INSERT/UPDATE/DELETE and notify the phone's listeners"""
+        record = record or old_record or {}
+        phone = normalize_phone(record.get('customer_phone_number', ''))
+        if not phone:
+            return
+
+        with self._lock:
+            order = self._orders.pop(str(record.get('order_id')), None) if event_type != 'UPDATE' else None
+            if phone in self._loaded_at:
+                deliveries = self._by_phone.setdefault(phone, [])
+                existing = next((d for d in deliveries if d.get('order_id') == record.get('order_id')), None)
+                if event_type == 'DELETE':
+                    if existing:
+                        deliveries.remove(existing)
+                elif existing:
+                    # Change feed rows don't carry the orders join, so keep it
+                    existing.update(record)
+                elif 'orders' in record or order:
+                    deliveries.append({'orders': order, **record})
+                else:
+                    # Placed elsewhere: reload the phone's deliveries, joined, on next use
+                    self._loaded_at.pop(phone)
+                self._store(phone, deliveries)
+            listeners = list(self._listeners.get(phone, []))
+
+        for listener in listeners:
+            try:
+                listener({'event': event_type, **record})
+            except Exception as e:
+                logger.error('Error notifying delivery listener', extra={'error': repr(e)})
+
+    def subscribe(self, phone_number, listener: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """Call listener with every change for this phone; returns an unsubscribe function"""
+        phone = normalize_phone(phone_number)
+        with self._lock:
+            self._listeners.setdefault(phone, []).append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                listeners = self._listeners.get(phone, [])
+                if listener in listeners:
+                    listeners.remove(listener)
+                if not listeners:
+                    self._listeners.pop(phone, None)
+        return unsubscribe
+
+
+class SupabaseDeliveryFeed:
+    """Feeds Supabase realtime changes on the deliveries table into an OrderStatusIndex.
+
+    Given a MenuCache it also watches the menu table and invalidates the
+    cache on any change, so the next read reloads it and re-indexes the
+    changed rows.
+    """
+
+    def __init__(self, index: OrderStatusIndex, url: Optional[str] = None, key: Optional[str] = None,
+                 menu_cache: Optional[MenuCache] = None):
+        self.index = index
+        self.menu_cache = menu_cache
+        self.url = url or os.getenv("SUPABASE_URL")
+        self.key = key or os.getenv("SUPABASE_ANON_KEY")
+        self.client = None
+        self.channel = None
+        self._dropped = False
+
+    async def start(self) -> None:
+        from supabase import acreate_client
+
+        try:
+            self.client = await acreate_client(self.url, self.key)
+            self.channel = self.client.channel('deliveries-feed')
+            self.channel.on_postgres_changes('*', schema='public', table='deliveries', callback=self._on_change)
+            if self.menu_cache:
+                self.channel.on_postgres_changes('*', schema='public', table='menu',
+                                                 callback=lambda payload: self.menu_cache.invalidate())
+            await self.channel.subscribe(self._on_status)
+        except Exception as e:
+            # The index falls back to TTL expiry without a feed
+            logger.error('Error subscribing to deliveries changes', extra={'error': repr(e)})
+
+    def _on_status(self, state, error: Optional[Exception] = None) -> None:
+        # The realtime client rejoins after a drop and reports SUBSCRIBED again
+        state = getattr(state, 'value', state)
+        if state == 'SUBSCRIBED':
+            if self.menu_cache and self._dropped:
+                # Menu changes during the gap were missed as well
+                self.menu_cache.invalidate()
+            self._dropped = False
+            self.index.set_live(True)
+        elif state in ('CHANNEL_ERROR', 'TIMED_OUT', 'CLOSED'):
+            # Until it is back, order status entries expire after their ttl again
+            self._dropped = True
+            self.index.set_live(False)
+            logger.warning('Deliveries feed lost', extra={'state': state, 'error': repr(error)})
+
+    def _on_change(self, payload: Dict[str, Any]) -> None:
+        data = payload.get('data', payload)
+        event_type = data.get('type') or data.get('eventType')
+        record = data.get('record') or data.get('new')
+        old_record = data.get('old_record') or data.get('old')
+        self.index.apply_change(str(event_type).upper(), record, old_record)
+
+    async def stop(self) -> None:
+        self.index.set_live(False)
+        if self.client and self.channel:
+            await self.client.remove_channel(self.channel)
+
+
 class SupabaseFoodOrderingTools:
-    def __init__(self):
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_ANON_KEY")
-        
-        if not supabase_url or not supabase_key:
-            raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
-        
-        self.supabase: Client = create_client(supabase_url, supabase_key)
+    def __init__(self, warm_menu_cache: bool = False, client: Optional['Client'] = None,
+                 journal: Optional[OrderJournal] = None):
+        self._client = client
+        self.journal = journal
+        # Called with an entry's payload and the error when a journaled order is given up
+        self.on_journal_failure: Optional[Callable[[Dict[str, Any], Exception], None]] = None
+        self._journal_retry_at: Dict[str, float] = {}
+        self._client_lock = threading.Lock()
+        self.menu_index = MenuIndex()
+        self.menu_cache = MenuCache(self._fetch_menu, on_refresh=self.menu_index.sync)
+        self.order_index = OrderStatusIndex(self._fetch_order_status)
+        if warm_menu_cache:
+            self.menu_cache.warm()
+    
+    @property
+    def supabase(self) -> 'Client':
+        """The Supabase client, created on first query"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    supabase_url = os.getenv("SUPABASE_URL")
+                    supabase_key = os.getenv("SUPABASE_ANON_KEY")
+                    
+                    if not supabase_url or not supabase_key:
+                        raise ValueError("SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment variables")
+                    
+                    from supabase import create_client
+                    
+                    self._client = create_client(supabase_url, supabase_key)
+        return self._client
+    
+    def _fetch_menu(self) -> List[Dict[str, Any]]:
+        response = self.supabase.table('menu').select('*').eq('is_available', True).execute()
+        return response.data
     
     def get_menu_items(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
         try:
-            query = self.supabase.table('menu').select('*').eq('is_available', True)
-            
-            if category:
-                query = query.eq('category', category)
-            
-            response = query.execute()
-            return response.data
+            return self.menu_cache.get_items(category)
             
         except Exception as e:
-            print(f"Error fetching menu items: {e}")
+            logger.error('Error fetching menu items', extra={'error': repr(e)})
             return []
     
+    def resolve_menu_item(self, utterance: str, limit: int = 3) -> List[Dict[str, Any]]:
+        """Ranked menu items matching how the caller described one, e.g. a large coke"""
+        self.menu_cache.get_items()
+        return self.menu_index.search(utterance, limit)
+    
+    def _get_prices(self, item_ids: List[str]) -> Dict[str, float]:
+        prices = {}
+        missing = []
+        for item_id in item_ids:
+            try:
+                menu_item = self.menu_cache.get_item(item_id)
+            except Exception:
+                menu_item = None
+            if menu_item:
+                prices[item_id] = float(menu_item['price'])
+            else:
+                missing.append(item_id)
+        
+        if missing:
+            # One round trip for everything the cached menu doesn't cover
+            response = self.supabase.table('menu').select('item_id, price').in_('item_id', missing).execute()
+            for row in response.data:
+                prices[str(row['item_id'])] = float(row['price'])
+        return prices
+    
+    def _build_order(self, items: Dict[str, int], special_requests: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        # Ensure items is a regular dict and convert keys to strings
+        if hasattr(items, '_pb') or 'MapComposite' in str(type(items)):
+            items = dict(items)
+        
+        # Convert all keys to strings and values to integers for JSONB
+        items_dict = {str(k): int(v) for k, v in items.items()}
+        
+        prices = self._get_prices(list(items_dict))
+        total_amount = 0
+        for item_id, quantity in items_dict.items():
+            if item_id not in prices:
+                logger.warning('Item not found in menu', extra={'item_id': item_id})
+                return None
+            total_amount += prices[item_id] * quantity
+        
+        return {
+            'items': items_dict,  # Store as JSONB (Python dict, not JSON string)
+            'total_amount': total_amount,
+            'special_requests': special_requests
+        }
+    
     def create_order(self, items: Dict[str, int], special_requests: Optional[str] = None) -> Optional[int]:
         try:
-            total_amount = 0
-            for item_id, quantity in items.items():
-                menu_item = self.supabase.table('menu').select('price').eq('item_id', item_id).execute()
-                if menu_item.data:
-                    price = float(menu_item.data[0]['price'])
-                    total_amount += price * quantity
-                else:
-                    print(f"Item {item_id} not found in menu")
-                    return None
-            
-            # Ensure items is a regular dict and convert keys to strings
-            if hasattr(items, '_pb') or 'MapComposite' in str(type(items)):
-                items = dict(items)
-            
-            # Convert all keys to strings and values to integers for JSONB
-            items_dict = {str(k): int(v) for k, v in items.items()}
-            
-            order_data = {
-                'items': items_dict,  # Store as JSONB (Python dict, not JSON string)
-                'total_amount': total_amount,
-                'special_requests': special_requests
-            }
+            order_data = self._build_order(items, special_requests)
+            if order_data is None:
+                return None
             
             response = self.supabase.table('orders').insert(order_data).execute()
             
             if response.data:
+                self.order_index.remember_order(response.data[0])
                 return response.data[0]['order_id']
             return None
             
         except Exception as e:
-            print(f"Error creating order: {e}")
+            logger.error('Error creating order', extra={'error': repr(e)})
             return None
     
     def create_delivery(self, order_id: int, delivery_address: str, customer_phone_number: str) -> bool:
@@ -74,26 +405,329 @@ class SupabaseFoodOrderingTools:
                 'order_date': datetime.now().isoformat(),
                 'delivery_address': delivery_address,
                 'status': 'PREPARING',
-                'customer_phone_number': customer_phone_number
+                'customer_phone_number': _phone_column(customer_phone_number)
             }
             
             response = self.supabase.table('deliveries').insert(delivery_data).execute()
-            return len(response.data) > 0
+            if not response.data:
+                return False
+            if not self.order_index.live:
+                # Write through so the caller's next status lookup sees it without a query
+                self.order_index.apply_change('INSERT', response.data[0])
+            return True
             
         except Exception as e:
-            print(f"Error creating delivery: {e}")
+            logger.error('Error creating delivery', extra={'error': repr(e)})
             return False
     
+    def journal_place_order(self, idempotency_key: str, items: Dict[str, int], delivery_address: str,
+                            customer_phone_number: str, special_requests: Optional[str] = None,
+                            session_id: Optional[str] = None) -> Optional[int]:
+        """Journal an order and its delivery as one entry and return the order id straight away.
+
+        The id is derived from the key, so repeating a call returns the
+        original order instead of placing a second one. This needs
+        orders.order_id to accept ids from the client: a plain BIGINT or
+        GENERATED BY DEFAULT AS IDENTITY, not GENERATED ALWAYS.
+        A phone number without digits raises ValueError here rather than
+        failing the insert later.
+        """
+        phone = _phone_column(customer_phone_number)
+        order_data = self._build_order(items, special_requests)
+        if order_data is None:
+            return None
+        order_id = order_id_for(idempotency_key)
+        payload = {
+            'session_id': session_id,
+            'order': {'order_id': order_id, **order_data},
+            'delivery': {
+                'order_id': order_id,
+                'order_date': datetime.now().isoformat(),
+                'delivery_address': delivery_address,
+                'status': 'PREPARING',
+                'customer_phone_number': phone
+            },
+        }
+        payload, added = self.journal.append(idempotency_key, 'order', payload)
+        if added:
+            self.order_index.remember_order(payload['order'])
+        if added and not self.order_index.live:
+            # The feed reports it once committed; without one, write through now
+            self.order_index.apply_change('INSERT', payload['delivery'])
+        return payload['order']['order_id']
+    
+    def flush_journal(self, batch_size: int = DB_CONFIG["journal_batch_size"],
+                      max_attempts: int = DB_CONFIG["journal_max_attempts"]) -> int:
+        """Commit pending journal entries and return how many were committed.
+
+        All orders go out in one insert, then all deliveries. When a batch
+        insert fails its rows are retried one by one, so a bad entry only
+        holds back itself; it is retried with its own backoff until
+        max_attempts, then given up.
+        """
+        now = time.monotonic()
+        entries = [
+            entry for entry in self.journal.pending(batch_size + len(self._journal_retry_at))
+            if self._journal_retry_at.get(entry['key'], 0) <= now
+        ][:batch_size]
+        failures: Dict[str, Exception] = {}
+        # Orders first, since a delivery row references its order
+        for table, field in (('orders', 'order'), ('deliveries', 'delivery')):
+            self._commit_rows(table, field, [entry for entry in entries if entry['key'] not in failures], failures)
+        
+        committed = [entry['key'] for entry in entries if entry['key'] not in failures]
+        self.journal.record(committed, 'committed')
+        for key in committed:
+            self._journal_retry_at.pop(key, None)
+        for entry in entries:
+            if entry['key'] in failures:
+                self._record_failure(entry, failures[entry['key']], max_attempts)
+        return len(committed)
+    
+    def next_journal_retry(self) -> Optional[float]:
+        """Seconds until the next failed entry is due for a retry, or None if none are waiting"""
+        if not self._journal_retry_at:
+            return None
+        return max(0.0, min(self._journal_retry_at.values()) - time.monotonic())
+    
+    def _commit_rows(self, table: str, field: str, entries: List[Dict[str, Any]],
+                     failures: Dict[str, Exception]) -> None:
+        if not entries:
+            return
+        try:
+            self._insert_unapplied(table, field, entries, check=any(entry['attempts'] for entry in entries))
+            return
+        except Exception as e:
+            if len(entries) == 1:
+                failures[entries[0]['key']] = e
+                return
+        # Row by row, so only the entries that fail are held back
+        for entry in entries:
+            try:
+                self._insert_unapplied(table, field, [entry], check=True)
+            except Exception as e:
+                failures[entry['key']] = e
+    
+    def _insert_unapplied(self, table: str, field: str, entries: List[Dict[str, Any]], check: bool) -> None:
+        rows = [entry['payload'][field] for entry in entries]
+        if check:
+            # An earlier attempt may have landed even though it reported an error
+            response = self.supabase.table(table).select('*').in_(
+                'order_id', [row['order_id'] for row in rows]
+            ).execute()
+            existing = {row['order_id']: row for row in response.data}
+            for row in rows:
+                if row['order_id'] in existing and not _same_row(table, existing[row['order_id']], row):
+                    raise JournalConflict(table, row['order_id'])
+            rows = [row for row in rows if row['order_id'] not in existing]
+        if rows:
+            self.supabase.table(table).insert(rows).execute()
+    
+    def _record_failure(self, entry: Dict[str, Any], error: Exception, max_attempts: int) -> None:
+        self.journal.record([entry['key']], 'error', repr(error))
+        attempts = entry['attempts'] + 1
+        # Retrying can't fix a conflicting row or an orders.order_id that refuses client ids
+        permanent = isinstance(error, JournalConflict) or 'non-DEFAULT value' in str(error)
+        if not permanent and attempts < max_attempts:
+            self._journal_retry_at[entry['key']] = time.monotonic() + min(DB_CONFIG["journal_max_backoff"],
+                                                                          2 ** (attempts - 1))
+            return
+        
+        self._journal_retry_at.pop(entry['key'], None)
+        payload = entry['payload']
+        order_id = payload['order']['order_id']
+        logger.error('Giving up on journaled order', extra={
+            'session': payload.get('session_id'), 'order_id': order_id, 'attempts': attempts, 'error': repr(error),
+        })
+        self.journal.record([entry['key']], 'failed', repr(error))
+        if not (isinstance(error, JournalConflict) and error.table == 'orders'):
+            # The order may have landed without its delivery; don't leave it behind
+            try:
+                self.supabase.table('orders').delete().eq('order_id', order_id).execute()
+            except Exception as e:
+                logger.error('Error rolling back order', extra={'order_id': order_id, 'error': repr(e)})
+        if not self.order_index.live:
+            self.order_index.apply_change('DELETE', payload['delivery'])
+        if self.on_journal_failure:
+            self.on_journal_failure(payload, error)
+    
+    def place_order_with_delivery(self, items: Dict[str, int], delivery_address: str,
+                                  customer_phone_number: str,
+                                  special_requests: Optional[str] = None) -> Optional[int]:
+        # Checked before the order is created so a bad number can't leave one behind
+        _phone_column(customer_phone_number)
+        order_id = self.create_order(items, special_requests)
+        if order_id is None:
+            return None
+        
+        if self.create_delivery(order_id, delivery_address, customer_phone_number):
+            return order_id
+        
+        # Roll back the order so a failed delivery doesn't leave an orphan
+        try:
+            self.supabase.table('orders').delete().eq('order_id', order_id).execute()
+        except Exception as e:
+            logger.error('Error rolling back order', extra={'order_id': order_id, 'error': repr(e)})
+        return None
+    
+    def _fetch_order_status(self, phone_number: str) -> List[Dict[str, Any]]:
+        phone = normalize_phone(phone_number)
+        if not phone:
+            return []
+        # Query deliveries by phone number and join with orders
+        response = self.supabase.table('deliveries').select(
+            '*, orders(*)'
+        ).eq('customer_phone_number', phone).execute()
+        return response.data
+    
     def get_order_status(self, phone_number: str) -> List[Dict[str, Any]]:
         try:
-            # Query deliveries by phone number and join with orders
-            response = self.supabase.table('deliveries').select(
-                '*, orders(*)'
-            ).eq('customer_phone_number', phone_number).execute()
-            
-            return response.data
+            return self.order_index.get(phone_number)
             
         except Exception as e:
-            print(f"Error fetching order status: {e}")
+            logger.error('Error fetching order status', extra={'error': repr(e)})
             return []
 
+
+class AsyncSupabaseFoodOrderingTools:
+    """Async facade that runs the blocking Supabase tools on a bounded thread pool.
+
+    All calls share one SupabaseFoodOrderingTools instance, and so one pooled
+    HTTP client. Reads are retried up to DB_CONFIG["retry_attempts"] times.
+    Writes get a single attempt, because retrying them could insert
+    duplicate rows. place_order with an idempotency key goes through the
+    order journal instead: it returns as soon as the entry is on disk,
+    and run_journal_flusher() commits it with retries.
+    """
+
+    def __init__(self, tools: Optional[SupabaseFoodOrderingTools] = None,
+                 max_workers: int = DB_CONFIG["max_workers"],
+                 timeout: float = DB_CONFIG["connection_timeout"],
+                 retry_attempts: int = DB_CONFIG["retry_attempts"]):
+        self.tools = tools or SupabaseFoodOrderingTools()
+        self.timeout = timeout
+        self.retry_attempts = max(1, retry_attempts)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='supabase')
+        self._journal_wakeup = asyncio.Event()
+
+    async def _call(self, func: Callable, *args, retry: bool = False, **kwargs):
+        loop = asyncio.get_running_loop()
+        attempts = self.retry_attempts if retry else 1
+        for attempt in range(1, attempts + 1):
+            try:
+                return await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs)),
+                    timeout=self.timeout,
+                )
+            except Exception as e:
+                if attempt == attempts:
+                    raise
+                logger.warning('Retrying after error', extra={
+                    'call': func.__name__, 'attempt': attempt, 'attempts': attempts, 'error': repr(e),
+                })
+                await asyncio.sleep(0.1 * 2 ** (attempt - 1))
+
+    async def get_menu_items(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
+        try:
+            return await self._call(self.tools.menu_cache.get_items, category, retry=True)
+        except Exception as e:
+            logger.error('Error fetching menu items', extra={'error': repr(e)})
+            return []
+
+    async def refresh_menu(self) -> int:
+        """Reload the menu cache off the event loop and return how many items it holds"""
+        await self._call(self.tools.menu_cache.refresh, retry=True)
+        return len(self.tools.menu_cache.get_items())
+
+    async def resolve_menu_item(self, utterance: str, limit: int = 3) -> List[Dict[str, Any]]:
+        # A fresh index answers in microseconds, so skip the thread pool unless the menu needs reloading
+        if not self.tools.menu_cache.is_stale():
+            return self.tools.menu_index.search(utterance, limit)
+        try:
+            return await self._call(self.tools.resolve_menu_item, utterance, limit, retry=True)
+        except Exception as e:
+            logger.error('Error resolving menu item', extra={'error': repr(e)})
+            return []
+
+    async def create_order(self, items: Dict[str, int], special_requests: Optional[str] = None) -> Optional[int]:
+        try:
+            return await self._call(self.tools.create_order, items, special_requests)
+        except Exception as e:
+            logger.error('Error creating order', extra={'error': repr(e)})
+            return None
+
+    async def create_delivery(self, order_id: int, delivery_address: str, customer_phone_number: str) -> bool:
+        try:
+            return await self._call(self.tools.create_delivery, order_id, delivery_address, customer_phone_number)
+        except Exception as e:
+            logger.error('Error creating delivery', extra={'error': repr(e)})
+            return False
+
+    async def place_order_with_delivery(self, items: Dict[str, int], delivery_address: str,
+                                        customer_phone_number: str,
+                                        special_requests: Optional[str] = None) -> Optional[int]:
+        try:
+            return await self._call(self.tools.place_order_with_delivery, items, delivery_address,
+                                    customer_phone_number, special_requests)
+        except ValueError:
+            # Bad input the model can correct, so it gets the message
+            raise
+        except Exception as e:
+            logger.error('Error placing order', extra={'error': repr(e)})
+            return None
+
+    async def place_order(self, items: Dict[str, int], delivery_address: str, customer_phone_number: str,
+                          special_requests: Optional[str] = None, idempotency_key: Optional[str] = None,
+                          session_id: Optional[str] = None) -> Optional[int]:
+        """Place an order with its delivery, through the journal when there is a key and a journal"""
+        if not (idempotency_key and self.tools.journal):
+            return await self.place_order_with_delivery(items, delivery_address, customer_phone_number,
+                                                        special_requests)
+        try:
+            order_id = await self._call(self.tools.journal_place_order, idempotency_key, items, delivery_address,
+                                        customer_phone_number, special_requests, session_id)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error('Error journaling order', extra={'error': repr(e)})
+            return None
+        self._journal_wakeup.set()
+        return order_id
+
+    async def get_order_status(self, phone_number: str) -> List[Dict[str, Any]]:
+        try:
+            return await self._call(self.tools.order_index.get, phone_number, retry=True)
+        except Exception as e:
+            logger.error('Error fetching order status', extra={'error': repr(e)})
+            return []
+
+    async def run_journal_flusher(self, delay: float = DB_CONFIG["journal_flush_delay_ms"] / 1000,
+                                  max_backoff: float = DB_CONFIG["journal_max_backoff"]) -> None:
+        """Commit journaled orders until cancelled.
+
+        Failed entries back off individually (see flush_journal), so this
+        sleeps until a new order arrives or the next retry is due.
+        """
+        backoff = None
+        while True:
+            try:
+                # Drain everything pending, including entries left over from a previous run
+                while await self._call(self.tools.flush_journal):
+                    pass
+                backoff = None
+                timeout = self.tools.next_journal_retry()
+            except Exception as e:
+                # The journal itself couldn't be read or written
+                backoff = min(max_backoff, backoff * 2 if backoff else 1.0)
+                timeout = backoff
+                logger.error('Error flushing order journal', extra={'retry_in': backoff, 'error': repr(e)})
+            try:
+                await asyncio.wait_for(self._journal_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._journal_wakeup.clear()
+            # Let writes arriving together go out in one batch
+            await asyncio.sleep(delay)
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
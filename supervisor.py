@@ -0,0 +1,66 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from config import SUPERVISOR_CONFIG
+
+
+class SessionLost(Exception):
+    """A pipeline task can't continue because the session behind it is gone; never restarted"""
+
+
+class TaskSupervisor:
+    """Runs a session's pipeline tasks and restarts the ones that fail.
+
+    A task that returns normally is finished. A task that raises is
+    restarted after restart_delay, up to max_restarts times within
+    window_seconds. A task that runs out of restarts, or raises one of
+    the fatal exception types, calls on_give_up instead, which is
+    expected to end the session. Every failure is reported to on_failure.
+    """
+
+    def __init__(self, log: logging.LoggerAdapter,
+                 on_give_up: Callable[[str, BaseException], None],
+                 on_failure: Optional[Callable[[str, BaseException, bool], None]] = None,
+                 fatal: Tuple[Type[BaseException], ...] = (SessionLost,),
+                 max_restarts: int = SUPERVISOR_CONFIG["max_restarts"],
+                 window_seconds: float = SUPERVISOR_CONFIG["window_seconds"],
+                 restart_delay: float = SUPERVISOR_CONFIG["restart_delay"]):
+        self.log = log
+        self.on_give_up = on_give_up
+        self.on_failure = on_failure
+        self.fatal = fatal
+        self.max_restarts = max_restarts
+        self.window_seconds = window_seconds
+        self.restart_delay = restart_delay
+        self.restarts: Dict[str, int] = {}
+
+    def start(self, name: str, factory: Callable[[], Awaitable]) -> asyncio.Task:
+        """Run factory() under supervision; must run on the event loop"""
+        return asyncio.create_task(self._supervise(name, factory), name=name)
+
+    async def _supervise(self, name, factory):
+        failures = deque()
+        while True:
+            try:
+                return await factory()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                now = time.monotonic()
+                failures.append(now)
+                while failures and now - failures[0] > self.window_seconds:
+                    failures.popleft()
+                restart = not isinstance(e, self.fatal) and len(failures) <= self.max_restarts
+                self.log.error('Pipeline task failed', exc_info=e, extra={
+                    'task': name, 'restart': restart, 'failures_in_window': len(failures),
+                })
+                if self.on_failure:
+                    self.on_failure(name, e, restart)
+                if not restart:
+                    self.on_give_up(name, e)
+                    return None
+                self.restarts[name] = self.restarts.get(name, 0) + 1
+                await asyncio.sleep(self.restart_delay)
@@ -0,0 +1,190 @@
+import asyncio
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from metrics import SessionMetrics
+from order_journal import idempotency_key
+from prefetch import PrefetchCache
+from sql_utils import AsyncSupabaseFoodOrderingTools, normalize_phone
+
+if TYPE_CHECKING:
+    from google.genai import types
+
+FUNCTION_DECLARATIONS = [
+    {
+        "name": "get_menu_items",
+        "description": "Fetch available menu items, optionally filtered by category.",
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                "category": {
+                    "type": "STRING",
+                    "description": "Menu category: 'Mains', 'Beverages', 'Sides' or 'Desserts'.",
+                },
+            },
+        },
+    },
+    {
+        "name": "resolve_menu_item",
+        "description": "Match what the caller said (e.g. 'a large coke') to menu items, best match first.",
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                "utterance": {"type": "STRING", "description": "The item as the caller described it."},
+                "limit": {"type": "INTEGER", "description": "Maximum number of candidates (default 3)."},
+            },
+            "required": ["utterance"],
+        },
+    },
+    {
+        "name": "place_order",
+        "description": "Place an order and its delivery in one step. The total is calculated from menu prices "
+                       "and the delivery starts as 'PREPARING'.",
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                "items": {
+                    "type": "ARRAY",
+                    "description": "The cart: one entry per menu item.",
+                    "items": {
+                        "type": "OBJECT",
+                        "properties": {
+                            "item_id": {"type": "INTEGER"},
+                            "quantity": {"type": "INTEGER"},
+                        },
+                        "required": ["item_id", "quantity"],
+                    },
+                },
+                "delivery_address": {"type": "STRING"},
+                "customer_phone_number": {"type": "STRING"},
+                "special_requests": {"type": "STRING"},
+            },
+            "required": ["items", "delivery_address", "customer_phone_number"],
+        },
+    },
+    {
+        "name": "get_order_status",
+        "description": "Get order status and details by customer phone number.",
+        "parameters": {
+            "type": "OBJECT",
+            "properties": {
+                "phone_number": {"type": "STRING"},
+            },
+            "required": ["phone_number"],
+        },
+    },
+]
+
+
+def _normalize_items(items) -> Dict[str, int]:
+    """Accept the cart as a list of {item_id, quantity} or an item_id -> quantity map"""
+    if isinstance(items, dict) or hasattr(items, 'items'):
+        return {str(k): int(v) for k, v in dict(items).items()}
+    return {str(int(entry['item_id'])): int(entry['quantity']) for entry in items}
+
+
+class ToolDispatcher:
+    """Runs Live API function calls against the Supabase tools"""
+
+    def __init__(self, tools: AsyncSupabaseFoodOrderingTools, emit: Callable[[str, Dict[str, Any]], None],
+                 metrics: Optional[SessionMetrics] = None,
+                 watch_phone: Optional[Callable[[str], None]] = None,
+                 idempotency_scope: Optional[Callable[[], str]] = None,
+                 prefetch: Optional[PrefetchCache] = None,
+                 session_id: Optional[str] = None):
+        self.tools = tools
+        self.emit = emit
+        self.metrics = metrics
+        self.watch_phone = watch_phone
+        # Identifies the current conversation turn, so a write repeated within it is applied once
+        self.idempotency_scope = idempotency_scope
+        # Results fetched when the session started, checked before querying
+        self.prefetch = prefetch
+        # Recorded with journaled orders so a failure can be reported back to this session
+        self.session_id = session_id
+        self.handlers = {
+            'get_menu_items': self.get_menu_items,
+            'resolve_menu_item': self.resolve_menu_item,
+            'place_order': self.place_order,
+            'get_order_status': self.get_order_status,
+        }
+
+    async def dispatch(self, function_calls) -> List['types.FunctionResponse']:
+        """Run every call of one tool_call message concurrently"""
+        return list(await asyncio.gather(*(self._run(fc) for fc in function_calls)))
+
+    async def _run(self, function_call) -> 'types.FunctionResponse':
+        # Imported here so loading the dispatcher doesn't pull in the whole SDK
+        from google.genai import types
+
+        name = function_call.name
+        args = dict(function_call.args or {})
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.emit('function_call', {'function_name': name, 'arguments': args, 'timestamp': timestamp})
+
+        started = time.perf_counter()
+        try:
+            handler = self.handlers.get(name)
+            if handler is None:
+                raise ValueError(f"Unknown function: {name}")
+            result = await handler(**args)
+            duration_ms = self._record_duration(name, started)
+            self.emit('function_result', {'function_name': name, 'result': result, 'duration_ms': duration_ms})
+            response = {'result': result}
+        except Exception as e:
+            duration_ms = self._record_duration(name, started)
+            self.emit('function_error', {'function_name': name, 'error': str(e), 'duration_ms': duration_ms})
+            response = {'error': str(e)}
+
+        return types.FunctionResponse(id=function_call.id, name=name, response=response)
+
+    def _record_duration(self, name, started) -> float:
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        if self.metrics:
+            self.metrics.observe_tool_call(name, duration_ms)
+        return duration_ms
+
+    async def _menu_refreshed(self):
+        # A stale menu is reloaded when the session starts; wait for that rather than reloading again
+        if self.prefetch and 'menu' in self.prefetch:
+            await self.prefetch.get('menu')
+
+    async def get_menu_items(self, category: Optional[str] = None):
+        await self._menu_refreshed()
+        return await self.tools.get_menu_items(category)
+
+    async def resolve_menu_item(self, utterance: str, limit=3):
+        await self._menu_refreshed()
+        return await self.tools.resolve_menu_item(utterance, int(limit))
+
+    def _idempotency_key(self, name, *args) -> Optional[str]:
+        if self.idempotency_scope is None:
+            return None
+        return idempotency_key(self.idempotency_scope(), name, *args)
+
+    async def place_order(self, items, delivery_address: str, customer_phone_number,
+                          special_requests: Optional[str] = None):
+        items = _normalize_items(items)
+        phone = str(customer_phone_number)
+        order_id = await self.tools.place_order(
+            items, delivery_address, phone, special_requests,
+            idempotency_key=self._idempotency_key('place_order', items, delivery_address, phone, special_requests),
+            session_id=self.session_id,
+        )
+        if order_id is None:
+            raise ValueError("Order could not be placed")
+        if self.watch_phone:
+            self.watch_phone(phone)
+        if self.prefetch:
+            self.prefetch.invalidate(('order_status', normalize_phone(phone)))
+        return {'order_id': order_id, 'status': 'PREPARING'}
+
+    async def get_order_status(self, phone_number):
+        if self.watch_phone:
+            self.watch_phone(str(phone_number))
+        if self.prefetch:
+            deliveries = await self.prefetch.get(('order_status', normalize_phone(phone_number)))
+            if deliveries is not None:
+                return deliveries
+        return await self.tools.get_order_status(str(phone_number))
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transcripts_session_id ON transcripts (session_id, id);
+"""
+
+
+class TranscriptStore:
+    """Conversation turns in a local SQLite table, paged per session by row id"""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def write_batch(self, rows):
+        """Insert (session_id, role, text, created_at) rows in one transaction"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    'INSERT INTO transcripts (session_id, role, text, created_at) VALUES (?, ?, ?, ?)', rows
+                )
+
+    def page(self, session_id, after=0, limit=50):
+        """Return up to limit turns after row id `after`, and the cursor for the next page"""
+        with self._lock:
+            rows = self._connect().execute(
+                'SELECT id, role, text, created_at FROM transcripts '
+                'WHERE session_id = ? AND id > ? ORDER BY id LIMIT ?',
+                (session_id, after, limit + 1),
+            ).fetchall()
+        turns = [
+            {'id': row_id, 'role': role, 'text': text, 'created_at': created_at}
+            for row_id, role, text, created_at in rows[:limit]
+        ]
+        return {'turns': turns, 'next_after': turns[-1]['id'] if len(rows) > limit else None}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class TranscriptWriter:
+    """Buffers transcript turns on the event loop and writes them in batches.
+
+    record() only appends to a list. A batch goes to the store on a
+    dedicated writer thread once flush_turns turns are buffered or
+    flush_interval_ms after the first one, so persistence never holds up
+    the audio path.
+    """
+
+    def __init__(self, store, flush_turns=20, flush_interval_ms=1000):
+        self.store = store
+        self.flush_turns = flush_turns
+        self.flush_interval_ms = flush_interval_ms
+        self.turns_written = 0
+        self.write_errors = 0
+        self._pending = []
+        self._timer = None
+        self._flushes = set()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transcripts')
+
+    def record(self, session_id, role, text):
+        """Buffer one turn; must be called on the event loop"""
+        text = text.strip()
+        if not text:
+            return
+        self._pending.append((session_id, role, text, time.time()))
+        if len(self._pending) >= self.flush_turns:
+            self._flush_soon()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval_ms / 1000, self._flush_soon)
+
+    def _flush_soon(self):
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def flush(self):
+        """Write everything buffered so far"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        rows, self._pending = self._pending, []
+        if not rows:
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.store.write_batch, rows)
+            self.turns_written += len(rows)
+        except Exception as e:
+            self.write_errors += 1
+            logger.error('Transcript write error', extra={'turns': len(rows), 'error': repr(e)})